@@ -36,6 +36,7 @@ CREATE EXTERNAL TABLE IF NOT EXISTS service_records (
     high_risk_indicator BOOLEAN COMMENT 'High-risk pattern flag'
 )
 PARTITIONED BY (year INT, month INT)
+CLUSTERED BY (student_id) SORTED BY (student_id, appointment_date) INTO 128 BUCKETS
 STORED AS PARQUET
 LOCATION '/user/hive/warehouse/mental_health.db/service_records'
 TBLPROPERTIES ('parquet.compress'='SNAPPY');
@@ -6,10 +6,15 @@ Identifies underserved populations and resource allocation opportunities
 import pandas as pd
 import numpy as np
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 import matplotlib.pyplot as plt
 import seaborn as sns
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import functools
+import hashlib
 import logging
+import os
 
 # Configure logging
 logging.basicConfig(
@@ -23,20 +28,190 @@ sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (12, 6)
 
 
+# Source table for all gap analyses; queries take it as the {table} placeholder
+SERVICE_RECORDS_TABLE = '`mental_health.service_records`'
+
+DEMOGRAPHIC_GAPS_QUERY = """
+SELECT 
+    student_year,
+    student_college,
+    international_student,
+    first_generation,
+    COUNT(*) as total_visits,
+    AVG(wait_days) as avg_wait_days,
+    APPROX_COUNT_DISTINCT(student_id) as unique_students,
+    SUM(CASE WHEN no_show THEN 1 ELSE 0 END) as no_shows
+FROM {table}
+GROUP BY student_year, student_college, international_student, first_generation
+HAVING total_visits > 10
+ORDER BY avg_wait_days DESC
+"""
+
+TEMPORAL_GAPS_QUERY = """
+SELECT 
+    year,
+    month,
+    EXTRACT(DAYOFWEEK FROM appointment_date) as day_of_week,
+    service_category,
+    COUNT(*) as appointment_count,
+    AVG(wait_days) as avg_wait_days,
+    APPROX_COUNT_DISTINCT(counselor_id) as available_counselors
+FROM {table}
+GROUP BY year, month, day_of_week, service_category
+ORDER BY year, month, day_of_week
+"""
+
+SERVICE_TYPE_GAPS_QUERY = """
+SELECT 
+    service_category,
+    student_college,
+    COUNT(*) as demand,
+    AVG(wait_days) as avg_wait,
+    SUM(CASE WHEN wait_days > 7 THEN 1 ELSE 0 END) as extended_wait_count,
+    APPROX_COUNT_DISTINCT(counselor_id) as counselor_count
+FROM {table}
+GROUP BY service_category, student_college
+"""
+
+UNDERSERVED_POPULATIONS_QUERY = """
+WITH student_stats AS (
+    SELECT 
+        student_id,
+        student_year,
+        international_student,
+        first_generation,
+        COUNT(*) as total_visits,
+        AVG(wait_days) as avg_wait
+    FROM {table}
+    GROUP BY student_id, student_year, international_student, first_generation
+),
+population_stats AS (
+    SELECT 
+        student_year,
+        international_student,
+        first_generation,
+        COUNT(*) as student_count,
+        AVG(total_visits) as avg_visits_per_student,
+        AVG(avg_wait) as avg_wait_days
+    FROM student_stats
+    GROUP BY student_year, international_student, first_generation
+)
+SELECT *
+FROM population_stats
+ORDER BY avg_wait_days DESC
+"""
+
+CAPACITY_QUERY = """
+SELECT 
+    service_category,
+    COUNT(DISTINCT counselor_id) as current_counselors,
+    COUNT(*) as total_appointments,
+    SUM(duration_minutes) as total_minutes
+FROM {table}
+GROUP BY service_category
+"""
+
+WAIT_TIME_QUERY = """
+SELECT 
+    service_category,
+    AVG(wait_days) as avg_wait_days,
+    APPROX_QUANTILES(wait_days, 100)[OFFSET(75)] as p75_wait_days
+FROM {table}
+GROUP BY service_category
+"""
+
+# Low-cardinality result columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = [
+    'student_year', 'student_college', 'service_category', 'referral_source',
+    'international_student', 'first_generation'
+]
+
+
+def _categoricalize(df):
+    """Convert known low-cardinality columns to categorical dtype"""
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+# BigQuery clients shared by all analyzers in the process, keyed by project
+_client_cache = {}
+
+
+def _get_client(project_id):
+    """Return the shared BigQuery client for a project, creating it on first use"""
+    if project_id not in _client_cache:
+        _client_cache[project_id] = bigquery.Client(project=project_id)
+    return _client_cache[project_id]
+
+
+def disk_cached(query_method):
+    """
+    Memoize a query method's results as parquet files on disk
+    
+    Entries are keyed by the query text and the last modification time of
+    SERVICE_RECORDS_TABLE, so only apply this to methods whose queries read
+    that table alone; reloading the table invalidates them.
+    """
+    @functools.wraps(query_method)
+    def wrapper(self, query):
+        if self.cache_dir is None:
+            return query_method(self, query)
+        
+        cache_path = self._cache_path(query, self._table_version())
+        if os.path.exists(cache_path):
+            logger.info(f"Loading cached query result from {cache_path}")
+            return self._read_cache(cache_path)
+        
+        df = query_method(self, query)
+        self._write_cache(cache_path, df)
+        return df
+    
+    return wrapper
+
+
 class ServiceGapAnalyzer:
     """Analyze service gaps and resource allocation needs"""
     
-    def __init__(self, project_id):
+    def __init__(self, project_id, cache_dir='data/cache/bigquery', location='US'):
         """
         Initialize analyzer with BigQuery client
         
         Args:
             project_id (str): GCP project ID
+            cache_dir (str): Directory for cached query results (None disables caching)
+            location (str): BigQuery location all query jobs run in
         """
-        self.client = bigquery.Client(project=project_id)
+        self.client = _get_client(project_id)
+        self.location = location
+        self.cache_dir = cache_dir
         self.results = {}
+        # Headline counts recorded by each analysis, reused by generate_recommendations
+        self.summary_counts = {}
         logger.info(f"Initialized ServiceGapAnalyzer for project: {project_id}")
     
+    def _table_version(self):
+        """Last modification time of the source table"""
+        table = self.client.get_table(SERVICE_RECORDS_TABLE.strip('`'))
+        return table.modified.isoformat()
+    
+    def _cache_path(self, query, table_version):
+        """Cache file path for a query against a given table version"""
+        digest = hashlib.blake2b(query.encode('utf-8'), digest_size=16)
+        digest.update(table_version.encode('utf-8'))
+        return os.path.join(self.cache_dir, f"{digest.hexdigest()}.parquet")
+    
+    def _read_cache(self, cache_path):
+        """Load a cached query result with the same dtypes as a fresh one"""
+        # Parquet does not round-trip boolean categoricals, so re-apply the casts
+        return _categoricalize(pd.read_parquet(cache_path))
+    
+    def _write_cache(self, cache_path, df):
+        """Store a query result in the cache"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        df.to_parquet(cache_path, index=False)
+    
     def query_data(self, query):
         """
         Execute BigQuery query
@@ -47,166 +222,200 @@ class ServiceGapAnalyzer:
         Returns:
             DataFrame: Query results
         """
-        return self.client.query(query).to_dataframe()
+        job = self.client.query(
+            query,
+            job_config=bigquery.QueryJobConfig(use_query_cache=True),
+            location=self.location
+        )
+        df = job.to_dataframe(create_bqstorage_client=True)
+        return _categoricalize(df)
     
-    def analyze_demographic_gaps(self):
-        """Identify underserved demographic groups"""
-        logger.info("Analyzing demographic service gaps...")
+    @disk_cached
+    def _query_service_records(self, query):
+        """Execute one of this module's service_records queries, cached on disk"""
+        return self.query_data(query)
+    
+    def query_script(self, queries):
+        """
+        Execute several queries as a single BigQuery script job
         
-        query = """
-        SELECT 
-            student_year,
-            student_college,
-            international_student,
-            first_generation,
-            COUNT(*) as total_visits,
-            AVG(wait_days) as avg_wait_days,
-            COUNTDISTINCT(student_id) as unique_students,
-            SUM(CASE WHEN no_show THEN 1 ELSE 0 END) as no_shows
-        FROM `mental_health.service_records`
-        GROUP BY student_year, student_college, international_student, first_generation
-        HAVING total_visits > 10
-        ORDER BY avg_wait_days DESC
+        All queries run against the source table in one job (one submission
+        and one wait instead of six); each still scans only its own columns.
+        Each query's result is downloaded through the BigQuery Storage API.
+        Queries with a cached result are skipped.
+        
+        Args:
+            queries (dict): Result name -> SQL with a {table} placeholder
+            
+        Returns:
+            dict: Result name -> DataFrame
         """
+        results = {}
+        
+        # Serve what we can from the cache and only script the rest
+        if self.cache_dir is not None:
+            table_version = self._table_version()
+            cache_paths = {
+                name: self._cache_path(query.format(table=SERVICE_RECORDS_TABLE), table_version)
+                for name, query in queries.items()
+            }
+            for name, cache_path in cache_paths.items():
+                if os.path.exists(cache_path):
+                    logger.info(f"Loading cached {name} result from {cache_path}")
+                    results[name] = self._read_cache(cache_path)
+            queries = {name: query for name, query in queries.items() if name not in results}
+            if not queries:
+                return results
+        
+        statements = [query.format(table=SERVICE_RECORDS_TABLE) for query in queries.values()]
+        
+        script_job = self.client.query(';\n'.join(statements), location=self.location)
+        script_job.result()
+        
+        # Keep only the result-producing SELECTs, in evaluation order
+        child_jobs = sorted(
+            (
+                job for job in self.client.list_jobs(parent_job=script_job.job_id)
+                if job.statement_type == 'SELECT'
+            ),
+            key=lambda job: job.created
+        )
+        if len(child_jobs) != len(queries):
+            raise RuntimeError(
+                f"Script job {script_job.job_id} produced {len(child_jobs)} SELECT results "
+                f"for {len(queries)} queries ({', '.join(queries)}); cannot match results"
+            )
+        
+        bqstorage_client = bigquery_storage.BigQueryReadClient()
+        for name, job in zip(queries, child_jobs):
+            df = self.client.list_rows(job.destination).to_dataframe(bqstorage_client=bqstorage_client)
+            df = _categoricalize(df)
+            if self.cache_dir is not None:
+                self._write_cache(cache_paths[name], df)
+            results[name] = df
+        
+        return results
+    
+    def analyze_demographic_gaps(self, df=None):
+        """Identify underserved demographic groups"""
+        logger.info("Analyzing demographic service gaps...")
         
-        df = self.query_data(query)
+        if df is None:
+            df = self._query_service_records(
+                DEMOGRAPHIC_GAPS_QUERY.format(table=SERVICE_RECORDS_TABLE)
+            )
         
         # Calculate utilization rate (visits per unique student)
         df['utilization_rate'] = df['total_visits'] / df['unique_students']
         
-        # Identify gaps
-        df['service_gap'] = np.where(
-            (df['avg_wait_days'] > 7) | (df['utilization_rate'] < 2),
-            'High Gap',
-            np.where(
-                (df['avg_wait_days'] > 3) | (df['utilization_rate'] < 3),
-                'Moderate Gap',
-                'Adequate'
-            )
+        # Identify gaps (codes index into the category labels)
+        wait = df['avg_wait_days'].to_numpy(dtype=float, na_value=np.nan)
+        utilization = df['utilization_rate'].to_numpy(dtype=float, na_value=np.nan)
+        gap_codes = np.select(
+            [(wait > 7) | (utilization < 2), (wait > 3) | (utilization < 3)],
+            [2, 1],
+            default=0
+        ).astype(np.int8)
+        df['service_gap'] = pd.Categorical.from_codes(
+            gap_codes, ['Adequate', 'Moderate Gap', 'High Gap']
         )
         
         self.results['demographic_gaps'] = df
         
+        gap_counts = np.bincount(gap_codes, minlength=3)
+        self.summary_counts['high_gap_segments'] = int(gap_counts[2])
+        self.summary_counts['moderate_gap_segments'] = int(gap_counts[1])
+        
         # Summary statistics
         logger.info("\n=== Demographic Gap Summary ===")
         logger.info(f"Total demographic segments analyzed: {len(df)}")
-        logger.info(f"High gap segments: {len(df[df['service_gap'] == 'High Gap'])}")
-        logger.info(f"Moderate gap segments: {len(df[df['service_gap'] == 'Moderate Gap'])}")
+        logger.info(f"High gap segments: {self.summary_counts['high_gap_segments']}")
+        logger.info(f"Moderate gap segments: {self.summary_counts['moderate_gap_segments']}")
         
         return df
     
-    def analyze_temporal_gaps(self):
+    def analyze_temporal_gaps(self, df=None):
         """Identify time-based service gaps"""
         logger.info("Analyzing temporal service gaps...")
         
-        query = """
-        SELECT 
-            year,
-            month,
-            EXTRACT(DAYOFWEEK FROM appointment_date) as day_of_week,
-            service_category,
-            COUNT(*) as appointment_count,
-            AVG(wait_days) as avg_wait_days,
-            COUNTDISTINCT(counselor_id) as available_counselors
-        FROM `mental_health.service_records`
-        GROUP BY year, month, day_of_week, service_category
-        ORDER BY year, month, day_of_week
-        """
-        
-        df = self.query_data(query)
+        if df is None:
+            df = self._query_service_records(
+                TEMPORAL_GAPS_QUERY.format(table=SERVICE_RECORDS_TABLE)
+            )
         
-        # Map day of week
-        day_map = {1: 'Sunday', 2: 'Monday', 3: 'Tuesday', 4: 'Wednesday', 
-                   5: 'Thursday', 6: 'Friday', 7: 'Saturday'}
-        df['day_name'] = df['day_of_week'].map(day_map)
+        # Map day of week (BigQuery DAYOFWEEK is 1 = Sunday)
+        day_names = ['Sunday', 'Monday', 'Tuesday', 'Wednesday',
+                     'Thursday', 'Friday', 'Saturday']
+        day_codes = df['day_of_week'].to_numpy(dtype=np.int8) - 1
+        df['day_name'] = pd.Categorical.from_codes(day_codes, day_names)
         
         # Calculate demand-supply ratio
         df['demand_per_counselor'] = df['appointment_count'] / df['available_counselors']
         
         # Identify peak demand periods
-        threshold = df['demand_per_counselor'].quantile(0.75)
-        df['peak_demand'] = df['demand_per_counselor'] > threshold
+        demand = df['demand_per_counselor'].to_numpy(dtype=float, na_value=np.nan)
+        threshold = np.nanquantile(demand, 0.75)
+        df['peak_demand'] = demand > threshold
         
         self.results['temporal_gaps'] = df
+        self.summary_counts['peak_demand_periods'] = int(df['peak_demand'].sum())
         
-        logger.info(f"Peak demand periods identified: {df['peak_demand'].sum()}")
+        logger.info(f"Peak demand periods identified: {self.summary_counts['peak_demand_periods']}")
         
         return df
     
-    def analyze_service_type_gaps(self):
+    def analyze_service_type_gaps(self, df=None):
         """Analyze gaps by service type"""
         logger.info("Analyzing service type gaps...")
         
-        query = """
-        SELECT 
-            service_category,
-            student_college,
-            COUNT(*) as demand,
-            AVG(wait_days) as avg_wait,
-            SUM(CASE WHEN wait_days > 7 THEN 1 ELSE 0 END) as extended_wait_count,
-            COUNTDISTINCT(counselor_id) as counselor_count
-        FROM `mental_health.service_records`
-        GROUP BY service_category, student_college
-        """
-        
-        df = self.query_data(query)
+        if df is None:
+            df = self._query_service_records(
+                SERVICE_TYPE_GAPS_QUERY.format(table=SERVICE_RECORDS_TABLE)
+            )
         
         # Calculate metrics
         df['pct_extended_wait'] = (df['extended_wait_count'] / df['demand']) * 100
         df['demand_per_counselor'] = df['demand'] / df['counselor_count']
         
-        # Categorize service adequacy
-        df['adequacy_rating'] = pd.cut(
-            df['pct_extended_wait'],
-            bins=[0, 10, 25, 50, 100],
-            labels=['Excellent', 'Good', 'Needs Improvement', 'Critical']
+        # Categorize service adequacy: <=10% Excellent, <=25% Good, <=50% Needs Improvement
+        pct_extended = df['pct_extended_wait'].to_numpy(dtype=float, na_value=np.nan)
+        rating_codes = np.digitize(pct_extended, [10, 25, 50], right=True).astype(np.int8)
+        rating_codes[np.isnan(pct_extended)] = -1
+        df['adequacy_rating'] = pd.Categorical.from_codes(
+            rating_codes, ['Excellent', 'Good', 'Needs Improvement', 'Critical'], ordered=True
         )
         
         self.results['service_type_gaps'] = df
+        self.summary_counts['critical_service_areas'] = int((rating_codes == 3).sum())
+        
+        # Per-category summary in a single grouped pass
+        summary = (
+            df.assign(is_critical=df['adequacy_rating'] == 'Critical')
+            .groupby('service_category', observed=True, sort=False)
+            .agg(
+                total_demand=('demand', 'sum'),
+                avg_wait=('avg_wait', 'mean'),
+                critical_areas=('is_critical', 'sum')
+            )
+        )
         
         logger.info("\n=== Service Type Gap Summary ===")
-        for category in df['service_category'].unique():
-            cat_df = df[df['service_category'] == category]
-            logger.info(f"\n{category}:")
-            logger.info(f"  Total demand: {cat_df['demand'].sum()}")
-            logger.info(f"  Avg wait: {cat_df['avg_wait'].mean():.1f} days")
-            logger.info(f"  Critical areas: {len(cat_df[cat_df['adequacy_rating'] == 'Critical'])}")
+        for row in summary.itertuples():
+            logger.info(f"\n{row.Index}:")
+            logger.info(f"  Total demand: {row.total_demand}")
+            logger.info(f"  Avg wait: {row.avg_wait:.1f} days")
+            logger.info(f"  Critical areas: {row.critical_areas}")
         
         return df
     
-    def identify_underserved_populations(self):
+    def identify_underserved_populations(self, df=None):
         """Identify specific underserved student populations"""
         logger.info("Identifying underserved populations...")
         
-        query = """
-        WITH student_stats AS (
-            SELECT 
-                student_id,
-                student_year,
-                international_student,
-                first_generation,
-                COUNT(*) as total_visits,
-                AVG(wait_days) as avg_wait
-            FROM `mental_health.service_records`
-            GROUP BY student_id, student_year, international_student, first_generation
-        ),
-        population_stats AS (
-            SELECT 
-                student_year,
-                international_student,
-                first_generation,
-                COUNT(*) as student_count,
-                AVG(total_visits) as avg_visits_per_student,
-                AVG(avg_wait) as avg_wait_days
-            FROM student_stats
-            GROUP BY student_year, international_student, first_generation
-        )
-        SELECT *
-        FROM population_stats
-        ORDER BY avg_wait_days DESC
-        """
-        
-        df = self.query_data(query)
+        if df is None:
+            df = self._query_service_records(
+                UNDERSERVED_POPULATIONS_QUERY.format(table=SERVICE_RECORDS_TABLE)
+            )
         
         # Calculate service equity score (lower is more underserved)
         overall_avg_visits = df['avg_visits_per_student'].mean()
@@ -229,22 +438,15 @@ class ServiceGapAnalyzer:
         
         return df
     
-    def calculate_resource_needs(self):
+    def calculate_resource_needs(self, capacity_df=None, wait_df=None):
         """Calculate additional resource requirements"""
         logger.info("Calculating resource needs...")
         
         # Get current capacity
-        query = """
-        SELECT 
-            service_category,
-            COUNT(DISTINCT counselor_id) as current_counselors,
-            COUNT(*) as total_appointments,
-            SUM(duration_minutes) as total_minutes
-        FROM `mental_health.service_records`
-        GROUP BY service_category
-        """
-        
-        capacity_df = self.query_data(query)
+        if capacity_df is None:
+            capacity_df = self._query_service_records(
+                CAPACITY_QUERY.format(table=SERVICE_RECORDS_TABLE)
+            )
         
         # Calculate current workload
         capacity_df['avg_appointments_per_counselor'] = (
@@ -255,19 +457,16 @@ class ServiceGapAnalyzer:
         )
         
         # Get wait time data
-        wait_query = """
-        SELECT 
-            service_category,
-            AVG(wait_days) as avg_wait_days,
-            PERCENTILE_CONT(wait_days, 0.75) OVER(PARTITION BY service_category) as p75_wait_days
-        FROM `mental_health.service_records`
-        GROUP BY service_category
-        """
-        
-        wait_df = self.query_data(wait_query)
+        if wait_df is None:
+            wait_df = self._query_service_records(
+                WAIT_TIME_QUERY.format(table=SERVICE_RECORDS_TABLE)
+            )
         
-        # Merge data
-        resource_df = pd.merge(capacity_df, wait_df, on='service_category')
+        # Attach wait times (both frames hold one row per service category)
+        wait_df = wait_df.drop_duplicates('service_category').set_index('service_category')
+        resource_df = capacity_df.join(
+            wait_df[['avg_wait_days', 'p75_wait_days']], on='service_category', how='inner'
+        )
         
         # Calculate additional counselors needed
         # Assumption: Reduce wait time to <= 3 days, standard is 40 appointments/week
@@ -294,7 +493,8 @@ class ServiceGapAnalyzer:
             logger.info(f"  Additional counselors needed: {row['additional_counselors_needed']}")
             logger.info(f"  Percentage increase: {row['pct_increase_needed']}%")
         
-        total_additional = resource_df['additional_counselors_needed'].sum()
+        total_additional = int(resource_df['additional_counselors_needed'].sum())
+        self.summary_counts['additional_counselors_needed'] = total_additional
         logger.info(f"\nTotal additional counselors needed: {total_additional}")
         
         return resource_df
@@ -308,53 +508,47 @@ class ServiceGapAnalyzer:
         recommendations = []
         
         # Demographic recommendations
-        if 'demographic_gaps' in self.results:
-            high_gap = self.results['demographic_gaps'][
-                self.results['demographic_gaps']['service_gap'] == 'High Gap'
-            ]
+        if 'high_gap_segments' in self.summary_counts:
+            high_gap = self.summary_counts['high_gap_segments']
             
-            if len(high_gap) > 0:
+            if high_gap > 0:
                 recommendations.append({
                     'priority': 'HIGH',
                     'category': 'Demographic Gaps',
-                    'issue': f'{len(high_gap)} demographic segments with high service gaps',
+                    'issue': f'{high_gap} demographic segments with high service gaps',
                     'recommendation': 'Increase outreach and dedicated resources for international students, first-generation students, and specific colleges',
                     'expected_impact': '15-20% increase in utilization among underserved groups'
                 })
         
         # Temporal recommendations
-        if 'temporal_gaps' in self.results:
-            peak_periods = self.results['temporal_gaps'][
-                self.results['temporal_gaps']['peak_demand'] == True
-            ]
+        if 'peak_demand_periods' in self.summary_counts:
+            peak_periods = self.summary_counts['peak_demand_periods']
             
-            if len(peak_periods) > 0:
+            if peak_periods > 0:
                 recommendations.append({
                     'priority': 'HIGH',
                     'category': 'Scheduling Optimization',
-                    'issue': f'{len(peak_periods)} time periods with peak demand',
+                    'issue': f'{peak_periods} time periods with peak demand',
                     'recommendation': 'Extend counseling hours during midterms and finals; add weekend appointments',
                     'expected_impact': '10-15% reduction in average wait times'
                 })
         
         # Service type recommendations
-        if 'service_type_gaps' in self.results:
-            critical_services = self.results['service_type_gaps'][
-                self.results['service_type_gaps']['adequacy_rating'] == 'Critical'
-            ]
+        if 'critical_service_areas' in self.summary_counts:
+            critical_services = self.summary_counts['critical_service_areas']
             
-            if len(critical_services) > 0:
+            if critical_services > 0:
                 recommendations.append({
                     'priority': 'CRITICAL',
                     'category': 'Service Capacity',
-                    'issue': f'{len(critical_services)} service-college combinations critically understaffed',
+                    'issue': f'{critical_services} service-college combinations critically understaffed',
                     'recommendation': 'Immediate hiring for crisis support and high-demand counseling services',
                     'expected_impact': '25-30% reduction in extended wait times'
                 })
         
         # Resource allocation recommendations
-        if 'resource_needs' in self.results:
-            total_needed = self.results['resource_needs']['additional_counselors_needed'].sum()
+        if 'additional_counselors_needed' in self.summary_counts:
+            total_needed = self.summary_counts['additional_counselors_needed']
             
             recommendations.append({
                 'priority': 'HIGH',
@@ -375,14 +569,19 @@ class ServiceGapAnalyzer:
         
         return recommendations
     
-    def save_results(self, output_path):
-        """Save all results to files"""
+    def save_results(self, output_path, max_workers=None):
+        """Save all results to Parquet files, written concurrently"""
         logger.info(f"\nSaving results to {output_path}")
         
-        for name, df in self.results.items():
-            filepath = f"{output_path}/{name}.csv"
-            df.to_csv(filepath, index=False)
+        def save(item):
+            name, df = item
+            filepath = f"{output_path}/{name}.parquet"
+            df.to_parquet(filepath, index=False)
             logger.info(f"Saved {name} to {filepath}")
+        
+        # PyArrow releases the GIL while encoding and writing
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(save, self.results.items()))
     
     def run_complete_analysis(self):
         """Execute complete service gap analysis"""
@@ -390,12 +589,22 @@ class ServiceGapAnalyzer:
         logger.info("STARTING COMPREHENSIVE SERVICE GAP ANALYSIS")
         logger.info("="*80 + "\n")
         
+        # Fetch every analysis input in one script job
+        data = self.query_script({
+            'demographic_gaps': DEMOGRAPHIC_GAPS_QUERY,
+            'temporal_gaps': TEMPORAL_GAPS_QUERY,
+            'service_type_gaps': SERVICE_TYPE_GAPS_QUERY,
+            'underserved': UNDERSERVED_POPULATIONS_QUERY,
+            'capacity': CAPACITY_QUERY,
+            'wait': WAIT_TIME_QUERY,
+        })
+        
         # Run all analyses
-        self.analyze_demographic_gaps()
-        self.analyze_temporal_gaps()
-        self.analyze_service_type_gaps()
-        self.identify_underserved_populations()
-        self.calculate_resource_needs()
+        self.analyze_demographic_gaps(data['demographic_gaps'])
+        self.analyze_temporal_gaps(data['temporal_gaps'])
+        self.analyze_service_type_gaps(data['service_type_gaps'])
+        self.identify_underserved_populations(data['underserved'])
+        self.calculate_resource_needs(data['capacity'], data['wait'])
         self.generate_recommendations()
         
         logger.info("\n" + "="*80)
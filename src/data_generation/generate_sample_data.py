@@ -5,12 +5,12 @@ Creates anonymized, realistic sample data for demonstration
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime, timedelta
-import random
 
 # Set random seed for reproducibility
 np.random.seed(42)
-random.seed(42)
 
 
 class SampleDataGenerator:
@@ -22,6 +22,11 @@ class SampleDataGenerator:
         self.end_date = pd.to_datetime(end_date)
         self.date_range = pd.date_range(start=self.start_date, end=self.end_date, freq='D')
         
+        # Per-day lookups, indexed by day offset from start_date
+        self.n_days = len(self.date_range)
+        self.date_values = self.date_range.strftime('%Y-%m-%d').to_numpy()
+        self.date_months = self.date_range.month.to_numpy()
+        
         # Define reference data
         self.service_types = [
             'Individual Counseling', 'Crisis Support', 'Group Therapy',
@@ -40,173 +45,275 @@ class SampleDataGenerator:
             'Self-referral', 'Faculty', 'Advisor', 'Peer', 'Health Services',
             'Residence Life', 'Athletics', 'Online', 'Emergency'
         ]
+        
+        # Cumulative sampling weights, built once and sampled with np.searchsorted
+        self.student_statuses = ['Full-time', 'Part-time']
+        self._status_cdf = self._cumulative_weights([0.85, 0.15])
+        self._service_cdf = self._cumulative_weights([35, 10, 15, 25, 8, 5, 2])
+        self._referral_cdf = self._cumulative_weights([40, 15, 10, 10, 10, 5, 3, 5, 2])
+        self._crisis_referral_cdf = self._cumulative_weights([20, 10, 5, 5, 15, 10, 5, 5, 25])
+        
+        # Fixed category sets keep the dtype identical across generated batches
+        self.categories = {
+            'service_type': self.service_types,
+            'student_year': self.student_years,
+            'student_college': self.colleges,
+            'student_status': self.student_statuses,
+            'referral_source': self.referral_sources + ['Follow-up'],
+        }
+        
+        # Appointment duration range (minutes) per service type, indexed like service_types
+        duration_ranges = {
+            'Workshop': (90, 120),
+            'Group Therapy': (60, 90),
+            'Crisis Support': (45, 90),
+        }
+        self._duration_low, self._duration_high = np.array(
+            [duration_ranges.get(service, (30, 60)) for service in self.service_types]
+        ).T
+    
+    @staticmethod
+    def _cumulative_weights(weights):
+        """Normalized cumulative distribution for categorical sampling"""
+        cdf = np.cumsum(weights, dtype=np.float64)
+        return cdf / cdf[-1]
+    
+    @staticmethod
+    def _sample(cdf, size):
+        """Draw category indices from a cumulative distribution"""
+        return np.searchsorted(cdf, np.random.random(size), side='right')
     
-    def generate_student_ids(self):
-        """Generate anonymized student IDs"""
-        return [f"STU{str(i).zfill(6)}" for i in range(1, self.num_students + 1)]
+    def generate_student_ids(self, start=0, count=None):
+        """Generate anonymized student IDs (optionally for a slice of students)"""
+        stop = self.num_students if count is None else start + count
+        return [f"STU{str(i).zfill(6)}" for i in range(start + 1, stop + 1)]
     
     def generate_counselor_ids(self, num_counselors=50):
         """Generate counselor IDs"""
         return [f"CNS{str(i).zfill(3)}" for i in range(1, num_counselors + 1)]
     
-    def generate_appointments(self):
-        """Generate appointment records"""
-        records = []
-        student_ids = self.generate_student_ids()
-        counselor_ids = self.generate_counselor_ids()
+    def _sample_visit_days(self, num_visits):
+        """Draw distinct, sorted day indices for each student's visits"""
+        n_days = self.n_days
+        student_idx = np.repeat(np.arange(len(num_visits)), num_visits)
+        days = np.random.randint(0, n_days, size=len(student_idx))
+        
+        # Redraw any day a student was already given (sampling without replacement)
+        while True:
+            order = np.lexsort((days, student_idx))
+            dup = np.zeros(len(days), dtype=bool)
+            dup[order[1:]] = (
+                (student_idx[order[1:]] == student_idx[order[:-1]]) &
+                (days[order[1:]] == days[order[:-1]])
+            )
+            if not dup.any():
+                break
+            days[dup] = np.random.randint(0, n_days, size=dup.sum())
+        
+        return days[order]
+    
+    def generate_appointments(self, start=0, count=None):
+        """
+        Generate appointment records
+        
+        Args:
+            start: Index of the first student to generate
+            count: Number of students to generate (defaults to all remaining)
+        """
+        student_ids = np.array(self.generate_student_ids(start, count))
+        counselor_ids = np.array(self.generate_counselor_ids())
+        service_types = np.array(self.service_types)
+        referral_sources = np.array(self.referral_sources)
         
         # Each student has a probability of using services
         service_utilization_prob = 0.15  # ~15% of students use services
+        active = np.random.random(len(student_ids)) < service_utilization_prob
+        student_ids = student_ids[active]
+        num_students = len(student_ids)
         
-        for student_id in student_ids:
-            if random.random() > service_utilization_prob:
-                continue
-            
-            # Student characteristics (remain constant)
-            student_year = random.choice(self.student_years)
-            student_college = random.choice(self.colleges)
-            student_status = random.choices(
-                ['Full-time', 'Part-time'],
-                weights=[0.85, 0.15]
-            )[0]
-            international_student = random.choices([True, False], weights=[0.12, 0.88])[0]
-            first_generation = random.choices([True, False], weights=[0.20, 0.80])[0]
-            
-            # Number of visits for this student (follows realistic distribution)
-            num_visits = int(np.random.gamma(2, 2)) + 1  # Most students: 1-5 visits
-            num_visits = min(num_visits, 20)  # Cap at 20 visits
-            
-            # Generate visits for this student
-            visit_dates = sorted(random.sample(list(self.date_range), min(num_visits, len(self.date_range))))
-            
-            for i, appointment_date in enumerate(visit_dates):
-                # Service type selection (crisis more likely for first visit)
-                if i == 0 and random.random() < 0.15:
-                    service_type = 'Crisis Support'
-                else:
-                    service_type = random.choices(
-                        self.service_types,
-                        weights=[35, 10, 15, 25, 8, 5, 2]
-                    )[0]
-                
-                # Counselor assignment (some consistency)
-                if i == 0:
-                    assigned_counselor = random.choice(counselor_ids)
-                else:
-                    # 70% chance of same counselor for continuity
-                    assigned_counselor = records[-1]['counselor_id'] if random.random() < 0.7 else random.choice(counselor_ids)
-                
-                # Duration varies by service type
-                if service_type == 'Workshop':
-                    duration = random.randint(90, 120)
-                elif service_type == 'Group Therapy':
-                    duration = random.randint(60, 90)
-                elif service_type == 'Crisis Support':
-                    duration = random.randint(45, 90)
-                else:
-                    duration = random.randint(30, 60)
-                
-                # Wait time (varies by time of year and service type)
-                month = appointment_date.month
-                # Higher wait times during academic stress periods (Oct, Nov, Apr, May)
-                if month in [10, 11, 4, 5]:
-                    base_wait = random.randint(7, 21)
-                else:
-                    base_wait = random.randint(2, 10)
-                
-                # Crisis support has shorter wait
-                if service_type == 'Crisis Support':
-                    wait_days = random.randint(0, 3)
-                else:
-                    wait_days = base_wait
-                
-                # No-show probability (higher for longer waits)
-                no_show_prob = 0.05 + (wait_days * 0.01)
-                no_show = random.random() < no_show_prob
-                
-                # Referral source (first visit)
-                if i == 0:
-                    if service_type == 'Crisis Support':
-                        referral_source = random.choices(
-                            self.referral_sources,
-                            weights=[20, 10, 5, 5, 15, 10, 5, 5, 25]
-                        )[0]
-                    else:
-                        referral_source = random.choices(
-                            self.referral_sources,
-                            weights=[40, 15, 10, 10, 10, 5, 3, 5, 2]
-                        )[0]
-                else:
-                    referral_source = 'Follow-up'
-                
-                # Follow-up scheduling (more likely if not last visit)
-                follow_up_scheduled = i < len(visit_dates) - 1 or random.random() < 0.4
-                
-                record = {
-                    'student_id': student_id,
-                    'appointment_date': appointment_date.strftime('%Y-%m-%d'),
-                    'service_type': service_type,
-                    'counselor_id': assigned_counselor,
-                    'duration_minutes': duration,
-                    'student_year': student_year,
-                    'student_college': student_college,
-                    'student_status': student_status,
-                    'international_student': international_student,
-                    'first_generation': first_generation,
-                    'referral_source': referral_source,
-                    'wait_days': wait_days,
-                    'no_show': no_show,
-                    'follow_up_scheduled': follow_up_scheduled
-                }
-                
-                records.append(record)
+        # Student characteristics (remain constant)
+        student_year = np.random.choice(self.student_years, size=num_students)
+        student_college = np.random.choice(self.colleges, size=num_students)
+        student_status = np.array(self.student_statuses)[self._sample(self._status_cdf, num_students)]
+        international_student = np.random.random(num_students) < 0.12
+        first_generation = np.random.random(num_students) < 0.20
+        
+        # Number of visits for each student (follows realistic distribution)
+        num_visits = np.random.gamma(2, 2, size=num_students).astype(int) + 1  # Most students: 1-5 visits
+        num_visits = np.minimum(num_visits, min(20, self.n_days))  # Cap at 20 visits
+        
+        # Expand students to one row per visit
+        total_visits = int(num_visits.sum())
+        visit_offsets = np.cumsum(num_visits) - num_visits
+        visit_index = np.arange(total_visits) - np.repeat(visit_offsets, num_visits)
+        is_first = visit_index == 0
+        is_last = visit_index == np.repeat(num_visits - 1, num_visits)
+        
+        visit_days = self._sample_visit_days(num_visits)
+        
+        # Service type selection (crisis more likely for first visit)
+        service_idx = self._sample(self._service_cdf, total_visits)
+        crisis_idx = self.service_types.index('Crisis Support')
+        service_idx[is_first & (np.random.random(total_visits) < 0.15)] = crisis_idx
+        service_type = service_types[service_idx]
+        is_crisis = service_idx == crisis_idx
         
-        return pd.DataFrame(records)
+        # Counselor assignment (some consistency)
+        # 70% chance of same counselor as the previous visit for continuity
+        new_counselor = is_first | (np.random.random(total_visits) >= 0.7)
+        counselor_draw = np.random.randint(0, len(counselor_ids), size=total_visits)
+        last_assignment = np.maximum.accumulate(np.where(new_counselor, np.arange(total_visits), 0))
+        assigned_counselor = counselor_ids[counselor_draw[last_assignment]]
+        
+        # Duration varies by service type
+        duration = np.random.randint(
+            self._duration_low[service_idx], self._duration_high[service_idx] + 1, dtype=np.int16
+        )
+        
+        # Wait time (varies by time of year and service type)
+        # Higher wait times during academic stress periods (Oct, Nov, Apr, May)
+        stress_period = np.isin(self.date_months[visit_days], [10, 11, 4, 5])
+        base_wait = np.where(
+            stress_period,
+            np.random.randint(7, 22, size=total_visits, dtype=np.int16),
+            np.random.randint(2, 11, size=total_visits, dtype=np.int16)
+        )
+        
+        # Crisis support has shorter wait
+        wait_days = np.where(is_crisis, np.random.randint(0, 4, size=total_visits, dtype=np.int16), base_wait)
+        
+        # No-show probability (higher for longer waits)
+        no_show = np.random.random(total_visits) < 0.05 + (wait_days * 0.01)
+        
+        # Referral source (first visit; crisis visits draw from their own weights)
+        referral_source = np.full(total_visits, 'Follow-up', dtype=referral_sources.dtype)
+        draws = np.random.random(int(is_first.sum()))
+        referral_source[is_first] = referral_sources[np.where(
+            is_crisis[is_first],
+            np.searchsorted(self._crisis_referral_cdf, draws, side='right'),
+            np.searchsorted(self._referral_cdf, draws, side='right')
+        )]
+        
+        # Follow-up scheduling (more likely if not last visit)
+        follow_up_scheduled = ~is_last | (np.random.random(total_visits) < 0.4)
+        
+        df = pd.DataFrame({
+            'student_id': np.repeat(student_ids, num_visits),
+            'appointment_date': self.date_values[visit_days],
+            'service_type': service_type,
+            'counselor_id': assigned_counselor,
+            'duration_minutes': duration,
+            'student_year': np.repeat(student_year, num_visits),
+            'student_college': np.repeat(student_college, num_visits),
+            'student_status': np.repeat(student_status, num_visits),
+            'international_student': np.repeat(international_student, num_visits),
+            'first_generation': np.repeat(first_generation, num_visits),
+            'referral_source': referral_source,
+            'wait_days': wait_days,
+            'no_show': no_show,
+            'follow_up_scheduled': follow_up_scheduled
+        })
+        
+        # Low-cardinality attributes are stored as categoricals
+        for col, categories in self.categories.items():
+            df[col] = pd.Categorical(df[col], categories=categories)
+        
+        return df
     
     def add_data_quality_issues(self, df, missing_rate=0.02):
         """Add realistic data quality issues"""
-        # Randomly set some values to NaN
-        for col in ['duration_minutes', 'wait_days']:
-            mask = np.random.random(len(df)) < missing_rate
-            df.loc[mask, col] = np.nan
+        # Randomly set some values to NaN (one mask row per column)
+        cols = ['duration_minutes', 'wait_days']
+        masks = np.random.random((len(cols), len(df))) < missing_rate
+        values = df[cols].to_numpy(dtype=np.float64, copy=True)
+        values[masks.T] = np.nan
+        df[cols] = values
         
         return df
     
-    def generate_dataset(self, output_path='data/raw/mental_health_data.csv'):
-        """Generate complete dataset"""
+    def generate_dataset(self, output_path='data/raw/mental_health_data.parquet', batch_size=2000):
+        """
+        Generate complete dataset
+        
+        Students are generated in batches of batch_size and each batch is
+        appended to the Parquet file as its own row group (sorted by date
+        within the group), so memory use does not grow with num_students.
+        
+        Returns:
+            str: Path of the written Parquet file, or None if no appointments
+                were generated (no file is written)
+        """
         print("Generating sample mental health service data...")
         print(f"Target students: {self.num_students}")
         print(f"Date range: {self.start_date.date()} to {self.end_date.date()}")
         
-        # Generate appointments
-        df = self.generate_appointments()
+        import os
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # Add minor data quality issues
-        df = self.add_data_quality_issues(df)
+        # Running summary statistics across batches
+        total_records = 0
+        unique_students = 0
+        min_date, max_date = None, None
+        service_counts = 0
+        college_counts = 0
+        wait_total, wait_count = 0.0, 0
+        no_shows = 0
         
-        # Sort by date
-        df = df.sort_values('appointment_date').reset_index(drop=True)
+        writer = None
+        try:
+            for start in range(0, self.num_students, batch_size):
+                # Generate appointments
+                df = self.generate_appointments(start, min(batch_size, self.num_students - start))
+                if len(df) == 0:
+                    continue
+                
+                # Add minor data quality issues
+                df = self.add_data_quality_issues(df)
+                
+                # Sort by date
+                df = df.sort_values('appointment_date').reset_index(drop=True)
+                
+                # Save to Parquet (columnar, keeps categorical dtypes)
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema, compression='snappy')
+                writer.write_table(table)
+                
+                # Students never span batches, so per-batch unique counts add up
+                total_records += len(df)
+                unique_students += df['student_id'].nunique()
+                batch_min, batch_max = df['appointment_date'].iloc[0], df['appointment_date'].iloc[-1]
+                min_date = batch_min if min_date is None else min(min_date, batch_min)
+                max_date = batch_max if max_date is None else max(max_date, batch_max)
+                service_counts = service_counts + df['service_type'].value_counts(sort=False)
+                college_counts = college_counts + df['student_college'].value_counts(sort=False)
+                wait_total += df['wait_days'].sum()
+                wait_count += df['wait_days'].count()
+                no_shows += int(df['no_show'].sum())
+        finally:
+            if writer is not None:
+                writer.close()
+        
+        if writer is None:
+            print("\nNo appointment records generated; no data file written")
+            return None
         
-        print(f"\nGenerated {len(df):,} appointment records")
-        print(f"Unique students served: {df['student_id'].nunique():,}")
-        print(f"Date range: {df['appointment_date'].min()} to {df['appointment_date'].max()}")
+        print(f"\nGenerated {total_records:,} appointment records")
+        print(f"Unique students served: {unique_students:,}")
+        print(f"Date range: {min_date} to {max_date}")
         
         # Print summary statistics
         print("\n=== Summary Statistics ===")
         print(f"Service Type Distribution:")
-        print(df['service_type'].value_counts())
+        print(service_counts.sort_values(ascending=False))
         print(f"\nCollege Distribution:")
-        print(df['student_college'].value_counts())
-        print(f"\nAverage wait time: {df['wait_days'].mean():.1f} days")
-        print(f"No-show rate: {df['no_show'].mean()*100:.1f}%")
+        print(college_counts.sort_values(ascending=False))
+        print(f"\nAverage wait time: {wait_total / wait_count:.1f} days")
+        print(f"No-show rate: {no_shows / total_records * 100:.1f}%")
         
-        # Save to CSV
-        import os
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        df.to_csv(output_path, index=False)
         print(f"\nData saved to: {output_path}")
         
-        return df
+        return output_path
 
 
 def main():
@@ -217,8 +324,8 @@ def main():
         end_date='2024-12-31'
     )
     
-    df = generator.generate_dataset(
-        output_path='/home/claude/unt-mental-health-analysis/data/raw/mental_health_data.csv'
+    generator.generate_dataset(
+        output_path='/home/claude/unt-mental-health-analysis/data/raw/mental_health_data.parquet'
     )
     
     print("\nSample data generation complete!")
@@ -5,12 +5,25 @@ Upload and manage data in Google Cloud Storage
 
 from google.cloud import storage
 from google.cloud import bigquery
+from google.cloud import bigquery_storage_v1
+from google.cloud.bigquery_storage_v1 import types as write_types
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import io
+import math
 import os
 import logging
-from pathlib import Path
-from typing import List, Optional
+import time
+from typing import Callable, Iterator, List, Optional, Union
+import pyarrow as pa
+import pyarrow.parquet as pq
 import yaml
 
+# libyaml's C loader when available, otherwise the pure-Python one
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,6 +31,64 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Files at or above this size are uploaded as parallel part blobs and composed
+MULTIPART_THRESHOLD = int(os.environ.get('GCS_MULTIPART_THRESHOLD_MB', '150')) * 1024 * 1024
+# GCS compose accepts at most 32 source objects
+MULTIPART_MAX_PARTS = min(32, int(os.environ.get('GCS_MULTIPART_MAX_PARTS', '32')))
+MULTIPART_CONCURRENCY = int(os.environ.get('GCS_MULTIPART_CONCURRENCY', '8'))
+
+# JSON API batch requests carry at most 100 calls
+BATCH_MAX_CALLS = 100
+
+# Resumable upload chunk size (must be a multiple of 256 KiB)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# (connect, read) timeout in seconds for upload requests
+UPLOAD_TIMEOUT = (10, 300)
+
+# upload_directory logs progress every N files or T seconds, whichever comes first
+PROGRESS_LOG_FILES = 1000
+PROGRESS_LOG_SECONDS = 10.0
+
+# AppendRows requests are capped at 10 MB, so keep each record batch under this
+APPEND_ROWS_MAX_BYTES = 8 * 1024 * 1024
+
+
+class _FileSlice(io.RawIOBase):
+    """Read-only stream over bytes [offset, offset + length) of a file, positioned at 0"""
+    
+    def __init__(self, path: str, offset: int, length: int):
+        self._file = open(path, 'rb')
+        self._offset = offset
+        self._length = length
+        self._pos = 0
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def tell(self):
+        return self._pos
+    
+    def seek(self, pos, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._length}[whence]
+        self._pos = min(self._length, max(0, base + pos))
+        return self._pos
+    
+    def read(self, size=-1):
+        remaining = self._length - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        self._file.seek(self._offset + self._pos)
+        data = self._file.read(size)
+        self._pos += len(data)
+        return data
+    
+    def close(self):
+        self._file.close()
+        super().close()
+
 
 class GCPDataIngestion:
     """Handle data ingestion to Google Cloud Platform"""
@@ -33,7 +104,10 @@ class GCPDataIngestion:
         self.project_id = project_id
         self.bucket_name = bucket_name
         self.storage_client = storage.Client(project=project_id)
+        # Bucket handle is a local reference (no RPC), reused by every blob operation
+        self._bucket = self.storage_client.bucket(bucket_name)
         self.bigquery_client = bigquery.Client(project=project_id)
+        self._write_client = None
         
         logger.info(f"Initialized GCP clients for project: {project_id}")
         logger.info(f"Using bucket: {bucket_name}")
@@ -55,64 +129,150 @@ class GCPDataIngestion:
             )
             logger.info(f"Created bucket {self.bucket_name} in {location}")
         
+        self._bucket = bucket
         return bucket
     
     def upload_file(
         self, 
         source_file_path: str, 
-        destination_blob_name: str
+        destination_blob_name: str,
+        if_not_exists: bool = False
     ) -> str:
         """
         Upload a file to GCS
         
+        Files larger than one chunk go through a resumable upload, so
+        transient errors only retry the failed chunk.
+        
         Args:
             source_file_path: Local file path
             destination_blob_name: Destination path in GCS
+            if_not_exists: Fail instead of overwriting an existing object
             
         Returns:
             GCS URI of uploaded file
         """
-        bucket = self.storage_client.bucket(self.bucket_name)
-        blob = bucket.blob(destination_blob_name)
-        
-        logger.info(f"Uploading {source_file_path} to gs://{self.bucket_name}/{destination_blob_name}")
-        
-        blob.upload_from_filename(source_file_path)
+        if_generation_match = 0 if if_not_exists else None
+        
+        logger.debug(f"Uploading {source_file_path} to gs://{self.bucket_name}/{destination_blob_name}")
+        
+        if os.path.getsize(source_file_path) >= MULTIPART_THRESHOLD:
+            self._composite_upload(source_file_path, destination_blob_name, if_generation_match)
+        else:
+            blob = self._bucket.blob(destination_blob_name, chunk_size=UPLOAD_CHUNK_SIZE)
+            blob.upload_from_filename(
+                source_file_path,
+                if_generation_match=if_generation_match,
+                timeout=UPLOAD_TIMEOUT
+            )
         
         gcs_uri = f"gs://{self.bucket_name}/{destination_blob_name}"
-        logger.info(f"Upload complete: {gcs_uri}")
+        logger.debug(f"Upload complete: {gcs_uri}")
         
         return gcs_uri
     
+    def _composite_upload(
+        self,
+        source_file_path: str,
+        destination_blob_name: str,
+        if_generation_match: Optional[int] = None
+    ):
+        """
+        Upload a large file as parallel part blobs composed into one object
+        
+        Args:
+            source_file_path: Local file path
+            destination_blob_name: Destination path in GCS
+            if_generation_match: Precondition for the composed object (0 = create only)
+        """
+        file_size = os.path.getsize(source_file_path)
+        num_parts = min(MULTIPART_MAX_PARTS, math.ceil(file_size / MULTIPART_THRESHOLD))
+        part_size = math.ceil(file_size / num_parts)
+        
+        logger.info(f"Uploading {source_file_path} as {num_parts} parallel parts")
+        
+        def upload_part(part_number):
+            offset = part_number * part_size
+            part_blob = self._bucket.blob(
+                f"{destination_blob_name}-tmp-parts/part{part_number:04d}",
+                chunk_size=UPLOAD_CHUNK_SIZE
+            )
+            # Resumable uploads require a stream positioned at 0; a per-part slice
+            # satisfies that and is read one UPLOAD_CHUNK_SIZE chunk at a time
+            length = min(part_size, file_size - offset)
+            with _FileSlice(source_file_path, offset, length) as part_stream:
+                part_blob.upload_from_file(part_stream, size=length, timeout=UPLOAD_TIMEOUT)
+            return part_blob
+        
+        with ThreadPoolExecutor(max_workers=MULTIPART_CONCURRENCY) as executor:
+            futures = [executor.submit(upload_part, n) for n in range(num_parts)]
+        
+        parts, errors = [], []
+        for future in futures:
+            try:
+                parts.append(future.result())
+            except Exception as e:
+                errors.append(e)
+        
+        try:
+            if errors:
+                raise errors[0]
+            self._bucket.blob(destination_blob_name).compose(
+                parts, if_generation_match=if_generation_match
+            )
+        finally:
+            # Remove the uploaded part blobs whether or not every part and compose succeeded
+            self.delete_blobs([part.name for part in parts])
+    
+    @staticmethod
+    def _iter_files(root: str) -> Iterator[str]:
+        """Lazily yield every file path below root, in directory walk order"""
+        for dirpath, _, filenames in os.walk(root, followlinks=False):
+            for filename in filenames:
+                yield os.path.join(dirpath, filename)
+    
     def upload_directory(
         self, 
         source_dir: str, 
-        destination_prefix: str = ""
+        destination_prefix: str = "",
+        max_workers: int = 16
     ) -> List[str]:
         """
-        Upload entire directory to GCS
+        Upload entire directory to GCS, uploading files concurrently
         
         Args:
             source_dir: Local directory path
             destination_prefix: Prefix for GCS paths
+            max_workers: Maximum number of concurrent uploads
             
         Returns:
-            List of GCS URIs
+            List of GCS URIs, in directory walk order
         """
-        uploaded_files = []
-        source_path = Path(source_dir)
-        
         logger.info(f"Uploading directory {source_dir} to GCS")
         
-        for file_path in source_path.rglob('*'):
-            if file_path.is_file():
-                relative_path = file_path.relative_to(source_path)
-                destination_blob = f"{destination_prefix}/{relative_path}".lstrip('/')
-                
-                gcs_uri = self.upload_file(str(file_path), destination_blob)
-                uploaded_files.append(gcs_uri)
+        def upload(file_path):
+            relative_path = os.path.relpath(file_path, source_dir)
+            destination_blob = f"{destination_prefix}/{relative_path}".lstrip('/')
+            return self.upload_file(file_path, destination_blob)
         
-        logger.info(f"Uploaded {len(uploaded_files)} files")
+        # Each blob upload is independent network I/O, so run them in parallel;
+        # uploads are submitted as the walk discovers files, not after it finishes
+        uploaded_files = []
+        start = last_log = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for gcs_uri in executor.map(upload, self._iter_files(source_dir)):
+                uploaded_files.append(gcs_uri)
+                
+                # Aggregate progress line instead of one log record per file
+                now = time.monotonic()
+                if (len(uploaded_files) % PROGRESS_LOG_FILES == 0
+                        or now - last_log >= PROGRESS_LOG_SECONDS):
+                    rate = len(uploaded_files) / max(now - start, 1e-9)
+                    logger.info(f"Uploaded {len(uploaded_files)} files ({rate:.1f} files/s)")
+                    last_log = now
+        
+        elapsed = time.monotonic() - start
+        logger.info(f"Uploaded {len(uploaded_files)} files in {elapsed:.1f}s")
         return uploaded_files
     
     def download_file(
@@ -127,8 +287,7 @@ class GCPDataIngestion:
             source_blob_name: Source path in GCS
             destination_file_path: Local destination path
         """
-        bucket = self.storage_client.bucket(self.bucket_name)
-        blob = bucket.blob(source_blob_name)
+        blob = self._bucket.blob(source_blob_name)
         
         logger.info(f"Downloading gs://{self.bucket_name}/{source_blob_name} to {destination_file_path}")
         
@@ -138,24 +297,112 @@ class GCPDataIngestion:
         blob.download_to_filename(destination_file_path)
         logger.info("Download complete")
     
-    def list_blobs(self, prefix: Optional[str] = None) -> List[str]:
+    def list_blobs(
+        self,
+        prefix: Optional[str] = None,
+        match: Optional[Callable[[str], bool]] = None,
+        max_results: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Lazily iterate blob names in bucket, page by page
+        
+        Args:
+            prefix: Optional prefix to filter blobs
+            match: Optional predicate a blob name must satisfy to be yielded
+            max_results: Stop after yielding this many names
+            
+        Yields:
+            Blob names
+        """
+        if max_results is not None and max_results <= 0:
+            return
+        
+        # Only names are needed, so ask the API for just the name field
+        yielded = 0
+        blobs = self._bucket.list_blobs(
+            prefix=prefix, fields="items/name,nextPageToken", page_size=1000
+        )
+        for blob in blobs:
+            if match is not None and not match(blob.name):
+                continue
+            
+            yield blob.name
+            yielded += 1
+            if max_results is not None and yielded >= max_results:
+                return
+    
+    def list_blob_metadata(self, prefix: Optional[str] = None) -> Iterator[storage.Blob]:
         """
-        List all blobs in bucket with optional prefix
+        Lazily iterate blobs in bucket with their full metadata
         
         Args:
             prefix: Optional prefix to filter blobs
             
+        Yields:
+            Blob objects (size, md5, timestamps, etc.)
+        """
+        yield from self._bucket.list_blobs(prefix=prefix, page_size=1000)
+    
+    def list_blob_names(
+        self,
+        prefix: Optional[str] = None,
+        match: Optional[Callable[[str], bool]] = None,
+        max_results: Optional[int] = None
+    ) -> List[str]:
+        """
+        List blob names in bucket with optional prefix
+        
+        Args:
+            prefix: Optional prefix to filter blobs
+            match: Optional predicate a blob name must satisfy
+            max_results: Maximum number of names to return
+            
         Returns:
             List of blob names
         """
-        bucket = self.storage_client.bucket(self.bucket_name)
-        blobs = list(bucket.list_blobs(prefix=prefix))
-        
-        blob_names = [blob.name for blob in blobs]
+        blob_names = list(self.list_blobs(prefix, match=match, max_results=max_results))
         logger.info(f"Found {len(blob_names)} blobs with prefix '{prefix}'")
         
         return blob_names
     
+    def list_prefixes(
+        self,
+        prefixes: List[str],
+        max_workers: int = 8
+    ) -> dict:
+        """
+        List blob names under several prefixes concurrently
+        
+        Pages within a prefix are sequential (each needs the previous page
+        token), so the fan-out is across prefixes.
+        
+        Args:
+            prefixes: Prefixes to list
+            max_workers: Maximum number of concurrent listings
+            
+        Returns:
+            Dict mapping each prefix to its list of blob names
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            listings = executor.map(lambda prefix: list(self.list_blobs(prefix)), prefixes)
+            return dict(zip(prefixes, listings))
+    
+    def delete_blobs(self, blob_names: List[str]):
+        """
+        Delete blobs using batched JSON API requests
+        
+        Up to BATCH_MAX_CALLS deletes share one HTTP round-trip.
+        
+        Args:
+            blob_names: Names of blobs to delete
+        """
+        for start in range(0, len(blob_names), BATCH_MAX_CALLS):
+            with self.storage_client.batch():
+                for name in blob_names[start:start + BATCH_MAX_CALLS]:
+                    self._bucket.blob(name).delete()
+        
+        logger.debug(f"Deleted {len(blob_names)} blobs")
+    
     def create_bigquery_dataset(
         self, 
         dataset_id: str, 
@@ -179,47 +426,167 @@ class GCPDataIngestion:
             dataset = self.bigquery_client.create_dataset(dataset)
             logger.info(f"Created dataset {dataset_ref}")
     
-    def load_gcs_to_bigquery(
+    def submit_load(
         self,
-        gcs_uri: str,
+        gcs_uri: Union[str, List[str]],
         dataset_id: str,
         table_id: str,
         schema: Optional[List[bigquery.SchemaField]] = None,
         write_disposition: str = "WRITE_TRUNCATE"
-    ):
+    ) -> bigquery.LoadJob:
         """
-        Load data from GCS to BigQuery
+        Start a GCS to BigQuery load job without waiting for it
         
         Args:
-            gcs_uri: GCS URI of source file
+            gcs_uri: GCS URI(s) of source files, wildcards allowed
+                (CSV, or Parquet if they end in .parquet)
             dataset_id: BigQuery dataset ID
             table_id: BigQuery table ID
             schema: Table schema (optional)
             write_disposition: Write disposition
+            
+        Returns:
+            Running load job
         """
         table_ref = f"{self.project_id}.{dataset_id}.{table_id}"
+        gcs_uris = [gcs_uri] if isinstance(gcs_uri, str) else list(gcs_uri)
         
-        job_config = bigquery.LoadJobConfig(
-            source_format=bigquery.SourceFormat.CSV,
-            skip_leading_rows=1,
-            autodetect=True if schema is None else False,
-            write_disposition=write_disposition,
-        )
+        if all(uri.endswith('.parquet') for uri in gcs_uris):
+            # Parquet is self-describing, so no header or autodetect needed
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.PARQUET,
+                write_disposition=write_disposition,
+            )
+        else:
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.CSV,
+                skip_leading_rows=1,
+                autodetect=True if schema is None else False,
+                write_disposition=write_disposition,
+            )
         
         if schema:
             job_config.schema = schema
         
-        logger.info(f"Loading {gcs_uri} to {table_ref}")
+        logger.info(f"Loading {', '.join(gcs_uris)} to {table_ref}")
         
-        load_job = self.bigquery_client.load_table_from_uri(
-            gcs_uri,
+        return self.bigquery_client.load_table_from_uri(
+            gcs_uris,
             table_ref,
             job_config=job_config
         )
+    
+    def wait_load(self, load_job: bigquery.LoadJob, timeout: Optional[float] = None):
+        """
+        Wait for a load job to complete
+        
+        Args:
+            load_job: Job returned by submit_load
+            timeout: Seconds to wait before giving up (optional)
+        """
+        load_job.result(timeout=timeout)
+        
+        table = load_job.destination
+        logger.info(
+            f"Loaded {load_job.output_rows} rows to "
+            f"{table.project}.{table.dataset_id}.{table.table_id}"
+        )
+    
+    def load_gcs_to_bigquery(
+        self,
+        gcs_uri: Union[str, List[str]],
+        dataset_id: str,
+        table_id: str,
+        schema: Optional[List[bigquery.SchemaField]] = None,
+        write_disposition: str = "WRITE_TRUNCATE"
+    ):
+        """
+        Load data from GCS to BigQuery
+        
+        Args:
+            gcs_uri: GCS URI(s) of source files, wildcards allowed
+                (CSV, or Parquet if they end in .parquet)
+            dataset_id: BigQuery dataset ID
+            table_id: BigQuery table ID
+            schema: Table schema (optional)
+            write_disposition: Write disposition
+        """
+        load_job = self.submit_load(gcs_uri, dataset_id, table_id, schema, write_disposition)
+        self.wait_load(load_job)
+    
+    def stream_to_bigquery(
+        self,
+        arrow_table: pa.Table,
+        dataset_id: str,
+        table_id: str
+    ):
+        """
+        Append an Arrow table to an existing BigQuery table via the Storage Write API
+        
+        Rows go to a PENDING stream and become visible atomically on commit,
+        without staging a file in GCS or waiting on a load job.
+        
+        Args:
+            arrow_table: Rows to append (column names must match the table schema)
+            dataset_id: BigQuery dataset ID
+            table_id: BigQuery table ID
+        """
+        if self._write_client is None:
+            self._write_client = bigquery_storage_v1.BigQueryWriteClient()
+        client = self._write_client
+        
+        table_ref = f"{self.project_id}.{dataset_id}.{table_id}"
+        parent = client.table_path(self.project_id, dataset_id, table_id)
+        write_stream = client.create_write_stream(
+            parent=parent,
+            write_stream=write_types.WriteStream(type_=write_types.WriteStream.Type.PENDING)
+        )
         
-        load_job.result()  # Wait for job to complete
+        logger.info(f"Streaming {arrow_table.num_rows} rows to {table_ref}")
+        
+        # Split into record batches that fit in a single AppendRows request
+        rows_per_batch = max(1, int(
+            arrow_table.num_rows * APPEND_ROWS_MAX_BYTES / max(arrow_table.nbytes, 1)
+        ))
+        serialized_schema = arrow_table.schema.serialize().to_pybytes()
+        
+        def append_requests():
+            offset = 0
+            for batch in arrow_table.to_batches(max_chunksize=rows_per_batch):
+                request = write_types.AppendRowsRequest(
+                    write_stream=write_stream.name,
+                    offset=offset,
+                    arrow_rows=write_types.AppendRowsRequest.ArrowData(
+                        writer_schema=write_types.ArrowSchema(serialized_schema=serialized_schema),
+                        rows=write_types.ArrowRecordBatch(
+                            serialized_record_batch=batch.serialize().to_pybytes()
+                        )
+                    )
+                )
+                offset += batch.num_rows
+                yield request
         
-        logger.info(f"Loaded {load_job.output_rows} rows to {table_ref}")
+        responses = client.append_rows(
+            append_requests(),
+            metadata=(("x-goog-request-params", f"write_stream={write_stream.name}"),)
+        )
+        for response in responses:
+            if response.error.code:
+                raise RuntimeError(f"Append to {table_ref} failed: {response.error.message}")
+        
+        client.finalize_write_stream(name=write_stream.name)
+        commit = client.batch_commit_write_streams(
+            write_types.BatchCommitWriteStreamsRequest(
+                parent=parent, write_streams=[write_stream.name]
+            )
+        )
+        if commit.stream_errors:
+            raise RuntimeError(
+                f"Commit to {table_ref} failed: "
+                f"{'; '.join(error.error_message for error in commit.stream_errors)}"
+            )
+        
+        logger.info(f"Streamed {arrow_table.num_rows} rows to {table_ref}")
     
     def create_external_table(
         self,
@@ -254,25 +621,43 @@ class GCPDataIngestion:
         """
         Setup complete data pipeline from configuration
         
+        Each entry under 'tables' is loaded from its 'gcs_uri' with a
+        WRITE_TRUNCATE load job by default. Entries with mode: 'stream' instead
+        append the local Parquet file in 'source' through the Storage Write API;
+        their table must already exist, and re-running setup appends the rows again.
+        
         Args:
             config_file: Path to YAML configuration file
         """
         logger.info("Setting up data pipeline from configuration")
         
         with open(config_file, 'r') as f:
-            config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=_YamlLoader)
         
         # Create bucket
         self.create_bucket_if_not_exists(
             location=config.get('bucket_location', 'US')
         )
         
-        # Upload data files
+        # Upload data files concurrently; one failed file does not stop the others
         if 'upload_files' in config:
-            for upload in config['upload_files']:
-                self.upload_file(
-                    upload['source'],
-                    upload['destination']
+            failures = []
+            with ThreadPoolExecutor(max_workers=config.get('upload_workers', 32)) as executor:
+                futures = {
+                    executor.submit(self.upload_file, upload['source'], upload['destination']): upload
+                    for upload in config['upload_files']
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        upload = futures[future]
+                        logger.error(f"Failed to upload {upload['source']}: {e}")
+                        failures.append(upload['source'])
+            
+            if failures:
+                raise RuntimeError(
+                    f"{len(failures)} of {len(futures)} uploads failed: {', '.join(failures)}"
                 )
         
         # Create BigQuery dataset
@@ -282,14 +667,33 @@ class GCPDataIngestion:
                 location=config.get('dataset_location', 'US')
             )
         
-        # Load tables
+        # Load tables: start every load job first, stream the opt-in appends
+        # while those run, then wait on the load jobs together
         if 'tables' in config:
             for table in config['tables']:
-                self.load_gcs_to_bigquery(
+                if table.get('mode', 'load') not in ('load', 'stream'):
+                    raise ValueError(
+                        f"Unknown mode {table['mode']!r} for table {table['table_id']}; "
+                        f"expected 'load' or 'stream'"
+                    )
+            
+            load_tables = [t for t in config['tables'] if t.get('mode', 'load') == 'load']
+            stream_tables = [t for t in config['tables'] if t.get('mode') == 'stream']
+            
+            load_jobs = [
+                self.submit_load(
                     table['gcs_uri'],
                     config['bigquery_dataset'],
                     table['table_id']
                 )
+                for table in load_tables
+            ]
+            for table in stream_tables:
+                self.stream_to_bigquery(
+                    pq.read_table(table['source']), config['bigquery_dataset'], table['table_id']
+                )
+            for load_job in load_jobs:
+                self.wait_load(load_job, timeout=config.get('load_timeout'))
         
         logger.info("Data pipeline setup complete")
 
@@ -3,15 +3,18 @@ Spark ETL Pipeline for Mental Health Service Analysis
 Processes raw data, performs transformations, and prepares for analysis
 """
 
+from pyspark import StorageLevel
 from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
 from pyspark.sql.functions import (
-    col, count, avg, sum, when, datediff, 
+    col, count, countDistinct, avg, when, datediff, 
     to_date, year, month, dayofweek, hour,
-    dense_rank, row_number, lag
+    dense_rank, row_number, lag, broadcast
 )
 from pyspark.sql.window import Window
 from pyspark.sql.types import *
 import logging
+import math
 from datetime import datetime
 
 # Configure logging
@@ -21,6 +24,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Schema of the raw service records
+RAW_SCHEMA = StructType([
+    StructField("student_id", StringType(), True),
+    StructField("appointment_date", DateType(), True),
+    StructField("service_type", StringType(), True),
+    StructField("counselor_id", StringType(), True),
+    StructField("duration_minutes", IntegerType(), True),
+    StructField("student_year", StringType(), True),
+    StructField("student_college", StringType(), True),
+    StructField("student_status", StringType(), True),
+    StructField("international_student", BooleanType(), True),
+    StructField("first_generation", BooleanType(), True),
+    StructField("referral_source", StringType(), True),
+    StructField("wait_days", IntegerType(), True),
+    StructField("no_show", BooleanType(), True),
+    StructField("follow_up_scheduled", BooleanType(), True)
+])
+
+# Service type -> service category lookup; unlisted types become "Other"
+SERVICE_CATEGORIES = [
+    ("Individual Counseling", "Counseling"),
+    ("Therapy Session", "Counseling"),
+    ("Crisis Support", "Crisis"),
+    ("Emergency", "Crisis"),
+    ("Group Therapy", "Group"),
+    ("Workshop", "Group"),
+]
+
+# service_records is bucketed by student_id; shuffle partitions match so
+# per-student aggregations and joins can skip the exchange
+SERVICE_RECORDS_BUCKETS = 128
+
+# Upper bound on the output file count derived from size estimates
+MAX_OUTPUT_FILES = 2000
+
 
 class MentalHealthETL:
     """ETL Pipeline for Mental Health Service Data"""
@@ -31,7 +69,14 @@ class MentalHealthETL:
             .appName(app_name) \
             .config("spark.sql.adaptive.enabled", "true") \
             .config("spark.sql.adaptive.coalescePartitions.enabled", "true") \
+            .config("spark.sql.adaptive.skewJoin.enabled", "true") \
+            .config("spark.sql.adaptive.localShuffleReader.enabled", "true") \
+            .config("spark.sql.adaptive.advisoryPartitionSizeInBytes", "64m") \
+            .config("spark.sql.files.maxPartitionBytes", "256m") \
+            .config("spark.sql.autoBroadcastJoinThreshold", "64m") \
             .config("spark.serializer", "org.apache.spark.serializer.KryoSerializer") \
+            .config("spark.sql.sources.bucketing.enabled", "true") \
+            .config("spark.sql.shuffle.partitions", str(SERVICE_RECORDS_BUCKETS)) \
             .config("spark.sql.warehouse.dir", "/user/hive/warehouse") \
             .enableHiveSupport() \
             .getOrCreate()
@@ -39,42 +84,46 @@ class MentalHealthETL:
         self.spark.sparkContext.setLogLevel("WARN")
         logger.info("Spark session initialized successfully")
     
+    def convert_csv_to_parquet(self, csv_path, parquet_path, num_partitions=None):
+        """
+        One-time conversion of raw CSV data to Parquet
+        
+        Args:
+            csv_path (str): GCS path to raw CSV data
+            parquet_path (str): GCS destination path for Parquet output
+            num_partitions (int): Output partition count (optional)
+        """
+        logger.info(f"Converting {csv_path} to Parquet at {parquet_path}")
+        
+        df = self.spark.read \
+            .option("header", "true") \
+            .schema(RAW_SCHEMA) \
+            .csv(csv_path)
+        
+        if num_partitions:
+            df = df.repartition(num_partitions)
+        
+        df.write.mode("overwrite").parquet(parquet_path)
+        logger.info("Conversion complete")
+    
     def extract_data(self, gcs_path):
         """
         Extract data from GCS bucket
         
         Args:
-            gcs_path (str): GCS path to raw data
+            gcs_path (str): GCS path to raw Parquet data
             
         Returns:
             DataFrame: Raw data
         """
         logger.info(f"Extracting data from {gcs_path}")
         
-        # Define schema for better performance
-        schema = StructType([
-            StructField("student_id", StringType(), True),
-            StructField("appointment_date", DateType(), True),
-            StructField("service_type", StringType(), True),
-            StructField("counselor_id", StringType(), True),
-            StructField("duration_minutes", IntegerType(), True),
-            StructField("student_year", StringType(), True),
-            StructField("student_college", StringType(), True),
-            StructField("student_status", StringType(), True),
-            StructField("international_student", BooleanType(), True),
-            StructField("first_generation", BooleanType(), True),
-            StructField("referral_source", StringType(), True),
-            StructField("wait_days", IntegerType(), True),
-            StructField("no_show", BooleanType(), True),
-            StructField("follow_up_scheduled", BooleanType(), True)
-        ])
-        
-        df = self.spark.read \
-            .option("header", "true") \
-            .schema(schema) \
-            .csv(gcs_path)
+        # Project and cast to the raw schema; Parquet lets Spark prune unread columns
+        df = self.spark.read.parquet(gcs_path).select(
+            *[col(field.name).cast(field.dataType) for field in RAW_SCHEMA.fields]
+        )
         
-        logger.info(f"Extracted {df.count()} records")
+        logger.info("Extraction plan created")
         return df
     
     def transform_data(self, df):
@@ -94,45 +143,38 @@ class MentalHealthETL:
                     .filter(col("appointment_date").isNotNull()) \
                     .dropDuplicates(["student_id", "appointment_date", "service_type"])
         
-        # Add temporal features
-        df_enriched = df_clean \
-            .withColumn("year", year(col("appointment_date"))) \
-            .withColumn("month", month(col("appointment_date"))) \
-            .withColumn("day_of_week", dayofweek(col("appointment_date"))) \
-            .withColumn("is_weekend", when(col("day_of_week").isin([1, 7]), True).otherwise(False))
-        
-        # Categorize service types
-        df_enriched = df_enriched.withColumn(
-            "service_category",
-            when(col("service_type").isin(["Individual Counseling", "Therapy Session"]), "Counseling")
-            .when(col("service_type").isin(["Crisis Support", "Emergency"]), "Crisis")
-            .when(col("service_type").isin(["Group Therapy", "Workshop"]), "Group")
-            .otherwise("Other")
+        # Categorize service types via a broadcast lookup (map-side join)
+        mapping_df = self.spark.createDataFrame(
+            SERVICE_CATEGORIES, ["service_type", "service_category"]
         )
+        df_categorized = df_clean \
+            .join(broadcast(mapping_df), "service_type", "left") \
+            .na.fill({"service_category": "Other"})
         
-        # Calculate student engagement metrics
+        # Student engagement window
         window_spec = Window.partitionBy("student_id").orderBy("appointment_date")
-        
-        df_enriched = df_enriched \
-            .withColumn("visit_number", row_number().over(window_spec)) \
-            .withColumn("prev_visit_date", lag("appointment_date").over(window_spec)) \
-            .withColumn(
-                "days_since_last_visit",
-                when(col("prev_visit_date").isNotNull(),
-                     datediff(col("appointment_date"), col("prev_visit_date")))
-                .otherwise(None)
-            )
-        
-        # Flag high-risk patterns
-        df_enriched = df_enriched.withColumn(
-            "high_risk_indicator",
+        prev_visit_date = lag("appointment_date").over(window_spec)
+        
+        # Temporal features, engagement metrics and risk flag in a single projection
+        df_enriched = df_categorized.select(
+            col("*"),
+            year(col("appointment_date")).alias("year"),
+            month(col("appointment_date")).alias("month"),
+            dayofweek(col("appointment_date")).alias("day_of_week"),
+            dayofweek(col("appointment_date")).isin(1, 7).alias("is_weekend"),
+            row_number().over(window_spec).alias("visit_number"),
+            prev_visit_date.alias("prev_visit_date"),
+            # datediff is null for a student's first visit (no previous date)
+            datediff(col("appointment_date"), prev_visit_date).alias("days_since_last_visit"),
+            # Flag high-risk patterns
             when((col("wait_days") > 14) | 
                  (col("service_category") == "Crisis") |
                  (col("no_show") == True), True)
             .otherwise(False)
+            .alias("high_risk_indicator")
         )
         
-        logger.info(f"Transformations complete. Records: {df_enriched.count()}")
+        logger.info("Transformations complete")
         return df_enriched
     
     def create_aggregate_views(self, df):
@@ -156,7 +198,7 @@ class MentalHealthETL:
             count("*").alias("total_visits"),
             avg("duration_minutes").alias("avg_duration"),
             avg("wait_days").alias("avg_wait_days"),
-            sum(when(col("no_show"), 1).otherwise(0)).alias("no_shows")
+            F.sum(col("no_show").cast("int")).alias("no_shows")
         )
         
         # Monthly trends
@@ -170,28 +212,44 @@ class MentalHealthETL:
         aggregates['service_gaps'] = df.groupBy("service_category", "student_college").agg(
             count("*").alias("demand"),
             avg("wait_days").alias("avg_wait"),
-            sum(when(col("wait_days") > 7, 1).otherwise(0)).alias("extended_wait_count")
+            F.sum((col("wait_days") > 7).cast("int")).alias("extended_wait_count")
         )
         
         # Counselor workload
         aggregates['counselor_workload'] = df.groupBy("counselor_id", "year", "month").agg(
             count("*").alias("appointments"),
-            sum("duration_minutes").alias("total_minutes"),
+            F.sum("duration_minutes").alias("total_minutes"),
             countDistinct("student_id").alias("unique_students")
         )
         
-        # Student retention
-        aggregates['student_retention'] = df.groupBy("student_id").agg(
-            count("*").alias("total_visits"),
-            min("appointment_date").alias("first_visit"),
-            max("appointment_date").alias("last_visit"),
-            avg("days_since_last_visit").alias("avg_visit_frequency")
+        # Student retention: one row per student, taken from each student's last
+        # visit. The input is already partitioned by student_id (engagement
+        # window), so this window adds no shuffle. The mean gap between
+        # consecutive visits telescopes to span / (visits - 1).
+        student_window = Window.partitionBy("student_id")
+        aggregates['student_retention'] = df.select(
+            "student_id",
+            "visit_number",
+            "appointment_date",
+            count("*").over(student_window).alias("total_visits"),
+            F.min("appointment_date").over(student_window).alias("first_visit")
+        ).filter(
+            col("visit_number") == col("total_visits")
+        ).select(
+            "student_id",
+            "total_visits",
+            "first_visit",
+            col("appointment_date").alias("last_visit"),
+            when(col("total_visits") > 1,
+                 datediff(col("appointment_date"), col("first_visit")) / (col("total_visits") - 1))
+            .alias("avg_visit_frequency")
         )
         
         logger.info(f"Created {len(aggregates)} aggregate views")
         return aggregates
     
-    def load_to_hive(self, df, table_name, partition_by=None):
+    def load_to_hive(self, df, table_name, partition_by=None, bucket_by=None,
+                     num_buckets=SERVICE_RECORDS_BUCKETS, sort_by=None):
         """
         Load data to Hive table
         
@@ -199,22 +257,51 @@ class MentalHealthETL:
             df (DataFrame): Data to load
             table_name (str): Target table name
             partition_by (list): Columns to partition by
+            bucket_by (list): Columns to bucket by (optional)
+            num_buckets (int): Number of buckets when bucket_by is set
+            sort_by (list): Columns to sort within each bucket
         """
         logger.info(f"Loading data to Hive table: {table_name}")
         
+        writer = df.write.mode("overwrite")
+        
         if partition_by:
-            df.write \
-                .mode("overwrite") \
-                .partitionBy(*partition_by) \
-                .saveAsTable(f"mental_health.{table_name}")
-        else:
-            df.write \
-                .mode("overwrite") \
-                .saveAsTable(f"mental_health.{table_name}")
+            writer = writer.partitionBy(*partition_by)
+        
+        if bucket_by:
+            writer = writer.bucketBy(num_buckets, *bucket_by)
+            if sort_by:
+                writer = writer.sortBy(*sort_by)
+        
+        writer.saveAsTable(f"mental_health.{table_name}")
         
         logger.info(f"Successfully loaded to {table_name}")
     
-    def save_to_gcs(self, df, gcs_path, format="parquet"):
+    def _output_partitions(self, df, target_file_mb):
+        """
+        Estimate the number of output files of ~target_file_mb
+        
+        Only a cached, materialized DataFrame has a measured size; plan
+        estimates for anything else (e.g. joins) can be wildly inflated, so
+        those keep their current partition count.
+        """
+        current = df.rdd.getNumPartitions()
+        if not df.is_cached:
+            return current
+        
+        cached = self.spark._jsparkSession.sharedState().cacheManager().lookupCachedData(df._jdf)
+        if cached.isEmpty():
+            return current
+        relation = cached.get().cachedRepresentation()
+        if not relation.cacheBuilder().isCachedColumnBuffersLoaded():
+            return current
+        
+        size_in_bytes = int(relation.stats().sizeInBytes().toString())
+        n = math.ceil(size_in_bytes / (target_file_mb * 1024 * 1024))
+        return min(MAX_OUTPUT_FILES, max(1, n))
+    
+    def save_to_gcs(self, df, gcs_path, format="parquet", partition_by=None,
+                    target_file_mb=128, num_files=None):
         """
         Save DataFrame to GCS
         
@@ -222,13 +309,36 @@ class MentalHealthETL:
             df (DataFrame): Data to save
             gcs_path (str): GCS destination path
             format (str): Output format (parquet, csv, etc.)
+            partition_by (list): Columns to partition by
+            target_file_mb (int): Approximate size of each output file
+            num_files (int): Fixed number of output files (skips size estimation,
+                which only applies to cached, materialized DataFrames)
         """
         logger.info(f"Saving data to {gcs_path}")
         
-        df.write \
+        # Size output files: coalesce small outputs, repartition large ones
+        current = df.rdd.getNumPartitions()
+        n = num_files or self._output_partitions(df, target_file_mb)
+        
+        if n < current:
+            df = df.coalesce(n)
+        elif n > current:
+            df = df.repartition(n, *(partition_by or []))
+        
+        if partition_by:
+            # Keep each output partition's rows contiguous within a file
+            df = df.sortWithinPartitions(*partition_by)
+        
+        logger.info(f"Writing {n} partition(s) to {gcs_path}")
+        
+        writer = df.write \
             .mode("overwrite") \
-            .format(format) \
-            .save(gcs_path)
+            .format(format)
+        
+        if partition_by:
+            writer = writer.partitionBy(*partition_by)
+        
+        writer.save(gcs_path)
         
         logger.info(f"Data saved successfully")
     
@@ -247,26 +357,43 @@ class MentalHealthETL:
         # Extract
         raw_df = self.extract_data(input_path)
         
-        # Transform
-        transformed_df = self.transform_data(raw_df)
-        
-        # Create aggregates
-        aggregates = self.create_aggregate_views(transformed_df)
-        
-        # Load to Hive
-        self.load_to_hive(transformed_df, "service_records", partition_by=["year", "month"])
-        
-        for name, agg_df in aggregates.items():
-            self.load_to_hive(agg_df, name)
-        
-        # Save to GCS
-        self.save_to_gcs(transformed_df, f"{output_path}/service_records")
-        
-        for name, agg_df in aggregates.items():
-            self.save_to_gcs(agg_df, f"{output_path}/aggregates/{name}")
-        
-        # Generate summary statistics
-        self.print_summary(transformed_df)
+        # Transform (cached: reused by the aggregates, both writes and the summary)
+        # PySpark's MEMORY_AND_DISK already stores blocks serialized (Kryo)
+        transformed_df = self.transform_data(raw_df).persist(StorageLevel.MEMORY_AND_DISK)
+        
+        # Create aggregates (cached: each is written to both Hive and GCS)
+        aggregates = {
+            name: agg_df.persist(StorageLevel.MEMORY_AND_DISK)
+            for name, agg_df in self.create_aggregate_views(transformed_df).items()
+        }
+        
+        try:
+            # Load to Hive
+            self.load_to_hive(
+                transformed_df, "service_records",
+                partition_by=["year", "month"],
+                bucket_by=["student_id"],
+                sort_by=["student_id", "appointment_date"]
+            )
+            
+            for name, agg_df in aggregates.items():
+                self.load_to_hive(agg_df, name)
+            
+            # Save to GCS
+            self.save_to_gcs(
+                transformed_df, f"{output_path}/service_records", partition_by=["year", "month"]
+            )
+            
+            for name, agg_df in aggregates.items():
+                # Aggregates are small: a single file each
+                self.save_to_gcs(agg_df, f"{output_path}/aggregates/{name}", num_files=1)
+            
+            # Generate summary statistics
+            self.print_summary(transformed_df)
+        finally:
+            for agg_df in aggregates.values():
+                agg_df.unpersist()
+            transformed_df.unpersist()
         
         logger.info("=" * 80)
         logger.info("ETL Pipeline Completed Successfully")
@@ -278,12 +405,17 @@ class MentalHealthETL:
         logger.info("SUMMARY STATISTICS")
         logger.info("=" * 80)
         
-        total_records = df.count()
-        unique_students = df.select("student_id").distinct().count()
+        # One pass over the data for all headline statistics
+        stats = df.agg(
+            count("*").alias("total_records"),
+            countDistinct("student_id").alias("unique_students"),
+            F.min("appointment_date").alias("first_date"),
+            F.max("appointment_date").alias("last_date")
+        ).collect()[0]
         
-        logger.info(f"Total Records: {total_records:,}")
-        logger.info(f"Unique Students: {unique_students:,}")
-        logger.info(f"Date Range: {df.agg({'appointment_date': 'min'}).collect()[0][0]} to {df.agg({'appointment_date': 'max'}).collect()[0][0]}")
+        logger.info(f"Total Records: {stats['total_records']:,}")
+        logger.info(f"Unique Students: {stats['unique_students']:,}")
+        logger.info(f"Date Range: {stats['first_date']} to {stats['last_date']}")
         
         logger.info("\nService Category Distribution:")
         df.groupBy("service_category").count().orderBy(col("count").desc()).show()
@@ -299,7 +431,7 @@ class MentalHealthETL:
 def main():
     """Main execution function"""
     # Configuration
-    INPUT_PATH = "gs://your-bucket/raw/mental_health_data.csv"
+    INPUT_PATH = "gs://your-bucket/raw/mental_health_data.parquet"
     OUTPUT_PATH = "gs://your-bucket/processed"
     
     # Initialize and run ETL
@@ -10,12 +10,84 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import cached_property
+from itertools import islice
+
+# Optional: server-side downsampling of long time-series traces
+try:
+    from plotly_resampler import FigureResampler
+except ImportError:
+    FigureResampler = None
 
 # Set style
 sns.set_style("whitegrid")
 plt.style.use('seaborn-v0_8-darkgrid')
 
+# Columns read by the plots; everything else in the source file is skipped
+COLUMNS = [
+    'student_id', 'appointment_date', 'service_type', 'counselor_id', 'duration_minutes',
+    'student_year', 'student_college', 'international_student', 'first_generation',
+    'wait_days', 'no_show'
+]
+
+# Low-cardinality columns grouped and counted by the plots
+CATEGORICAL_COLUMNS = [
+    'service_type', 'student_year', 'student_college',
+    'international_student', 'first_generation'
+]
+
+# Academic years in class order, so plots follow it for Parquet and CSV input alike
+STUDENT_YEAR_DTYPE = pd.CategoricalDtype(
+    ['Freshman', 'Sophomore', 'Junior', 'Senior', 'Graduate'], ordered=True
+)
+CATEGORICAL_DTYPES = {
+    **{col: 'category' for col in CATEGORICAL_COLUMNS},
+    'student_year': STUDENT_YEAR_DTYPE
+}
+
+# Wait-day ranges for the no-show rate plot, right-closed like pd.cut: (0, 3], (3, 7], ...
+WAIT_BIN_EDGES = np.array([0, 3, 7, 14, 30])
+WAIT_BIN_LABELS = pd.IntervalIndex.from_breaks(WAIT_BIN_EDGES).astype(str).tolist()
+
+# Traces longer than this are downsampled when plotly-resampler is installed
+RESAMPLE_MAX_POINTS = 1000
+
+
+def _resample(fig):
+    """Wrap a figure with plotly-resampler if available and any trace is long"""
+    if FigureResampler is None:
+        return fig
+    if not any(len(trace.x) > RESAMPLE_MAX_POINTS
+               for trace in fig.data if getattr(trace, 'x', None) is not None):
+        return fig
+    return FigureResampler(fig, default_n_shown_samples=RESAMPLE_MAX_POINTS)
+
+
+def _with_year_month(grouped):
+    """Replace the ym_int column of a grouped result with 'YYYY-MM' labels"""
+    ym_int = grouped.pop('ym_int')
+    labels = pd.to_datetime(ym_int.astype(str), format='%Y%m').dt.strftime('%Y-%m')
+    grouped.insert(0, 'year_month', labels)
+    return grouped
+
+
+def _write_figure(fig, save_path):
+    """Write a figure as HTML (plotly.js from CDN) or, for image paths, a static image via kaleido"""
+    if save_path.endswith('.html'):
+        fig.write_html(save_path, include_plotlyjs='cdn', full_html=True)
+    else:
+        fig.write_image(save_path, engine='kaleido')
+
+
+def _histogram_bar(values, bins, **kwargs):
+    """Bin values in NumPy and return a go.Bar of the counts (ships bins, not raw data)"""
+    values = np.asarray(values, dtype=float)
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=bins)
+    return go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), **kwargs)
+
 
 class MentalHealthVisualizer:
     """Create visualizations for mental health service analysis"""
@@ -42,19 +114,98 @@ class MentalHealthVisualizer:
         }
     
     def load_data(self, file_path):
-        """Load data from CSV"""
-        self.df = pd.read_csv(file_path)
-        self.df['appointment_date'] = pd.to_datetime(self.df['appointment_date'])
+        """
+        Load data from Parquet or CSV
+        
+        CSV input is parsed once and the enriched frame is kept in a
+        '<file>.parquet' sidecar, reused while it is newer than the CSV.
+        """
+        if file_path.endswith('.parquet'):
+            self.df = pd.read_parquet(file_path, columns=COLUMNS)
+            self.df['appointment_date'] = pd.to_datetime(self.df['appointment_date'])
+            self.df = self.df.astype(CATEGORICAL_DTYPES)
+            self._add_month_key()
+        else:
+            cache_path = file_path + '.parquet'
+            if (os.path.exists(cache_path)
+                    and os.path.getmtime(cache_path) >= os.path.getmtime(file_path)):
+                # Sidecar keeps datetime and string categoricals, so nothing is re-parsed
+                self.df = pd.read_parquet(cache_path)
+                # Boolean categoricals come back as plain bool; re-cast (no-op for the rest)
+                self.df = self.df.astype(CATEGORICAL_DTYPES)
+            else:
+                # Multithreaded Arrow parser; dates and categoricals are decoded in the same pass
+                self.df = pd.read_csv(
+                    file_path,
+                    engine='pyarrow',
+                    usecols=COLUMNS,
+                    parse_dates=['appointment_date'],
+                    dtype=CATEGORICAL_DTYPES
+                )
+                self._add_month_key()
+                try:
+                    self.df.to_parquet(cache_path, compression='zstd')
+                except OSError as e:
+                    print(f"Could not write cache {cache_path}: {e}")
+        
+        # Drop aggregates cached from previously loaded data
+        for name in self._cached_aggregates():
+            self.__dict__.pop(name, None)
+        
         print(f"Loaded {len(self.df)} records")
     
+    def _add_month_key(self):
+        """Add the integer YYYYMM key shared by every trend plot (formatted only after grouping)"""
+        dates = self.df['appointment_date'].dt
+        self.df['ym_int'] = dates.year.to_numpy(dtype=np.int32) * 100 + dates.month.to_numpy(dtype=np.int32)
+    
+    @classmethod
+    def _cached_aggregates(cls):
+        """Names of the cached_property aggregates"""
+        return [name for name, attr in vars(cls).items() if isinstance(attr, cached_property)]
+    
+    @cached_property
+    def _gap_pivot(self):
+        """Average wait days by college (rows) and service type (columns)"""
+        gap_matrix = self.df.groupby(
+            ['student_college', 'service_type'], observed=True, sort=False
+        )['wait_days'].mean().reset_index()
+        return gap_matrix.pivot(index='student_college', columns='service_type', values='wait_days')
+    
+    @cached_property
+    def _year_counts(self):
+        """Appointment counts by student year, in category order"""
+        return self.df.groupby('student_year', observed=True).size()
+    
+    @cached_property
+    def _monthly_counts(self):
+        """Appointment counts per year_month"""
+        return _with_year_month(self.df.groupby('ym_int').size().reset_index(name='count'))
+    
+    @cached_property
+    def _counselor_stats(self):
+        """Appointments, minutes and hours per counselor"""
+        return self.df.groupby('counselor_id', observed=True, sort=False).agg(
+            appointments=('student_id', 'size'),
+            total_minutes=('duration_minutes', 'sum')
+        ).assign(total_hours=lambda d: d['total_minutes'].to_numpy() * (1.0 / 60.0))
+    
+    @cached_property
+    def _kpis(self):
+        """Headline statistics for the executive dashboard"""
+        return {
+            'total_students': self.df['student_id'].nunique(),
+            'total_appointments': len(self.df),
+            'avg_wait': self.df['wait_days'].mean(),
+            'no_show_rate': self.df['no_show'].mean() * 100
+        }
+    
     def plot_service_utilization_trends(self, save_path=None):
         """Plot service utilization trends over time"""
-        # Aggregate by month and service category
-        monthly_data = self.df.copy()
-        monthly_data['year_month'] = monthly_data['appointment_date'].dt.to_period('M')
-        
-        trend_data = monthly_data.groupby(['year_month', 'service_type']).size().reset_index(name='count')
-        trend_data['year_month'] = trend_data['year_month'].astype(str)
+        # Aggregate by month and service category (sorted: lines are drawn in row order)
+        trend_data = _with_year_month(
+            self.df.groupby(['ym_int', 'service_type'], observed=True).size().reset_index(name='count')
+        )
         
         # Create interactive plot
         fig = px.line(
@@ -62,6 +213,7 @@ class MentalHealthVisualizer:
             x='year_month', 
             y='count', 
             color='service_type',
+            render_mode='webgl',
             title='Mental Health Service Utilization Trends',
             labels={'year_month': 'Month', 'count': 'Number of Appointments', 'service_type': 'Service Type'}
         )
@@ -71,9 +223,10 @@ class MentalHealthVisualizer:
             height=500,
             hovermode='x unified'
         )
+        fig = _resample(fig)
         
         if save_path:
-            fig.write_html(save_path)
+            _write_figure(fig, save_path)
         
         return fig
     
@@ -88,7 +241,7 @@ class MentalHealthVisualizer:
         )
         
         # By student year
-        year_counts = self.df['student_year'].value_counts()
+        year_counts = self._year_counts
         fig.add_trace(
             go.Bar(x=year_counts.index, y=year_counts.values, name='Student Year',
                   marker_color=self.colors['primary']),
@@ -96,15 +249,15 @@ class MentalHealthVisualizer:
         )
         
         # By college
-        college_counts = self.df['student_college'].value_counts()
+        college_counts = self.df.groupby('student_college', observed=True).size()
         fig.add_trace(
             go.Bar(x=college_counts.index, y=college_counts.values, name='College',
                   marker_color=self.colors['secondary']),
             row=1, col=2
         )
         
-        # International students
-        intl_counts = self.df['international_student'].value_counts()
+        # International students (category order False, True matches the labels)
+        intl_counts = self.df.groupby('international_student', observed=True).size()
         fig.add_trace(
             go.Pie(labels=['Domestic', 'International'], values=intl_counts.values,
                   marker=dict(colors=[self.colors['info'], self.colors['warning']])),
@@ -112,7 +265,7 @@ class MentalHealthVisualizer:
         )
         
         # First generation
-        first_gen_counts = self.df['first_generation'].value_counts()
+        first_gen_counts = self.df.groupby('first_generation', observed=True).size()
         fig.add_trace(
             go.Pie(labels=['Not First Gen', 'First Gen'], values=first_gen_counts.values,
                   marker=dict(colors=[self.colors['success'], self.colors['danger']])),
@@ -123,7 +276,7 @@ class MentalHealthVisualizer:
         fig.update_xaxes(tickangle=-45, row=1, col=2)
         
         if save_path:
-            fig.write_html(save_path)
+            _write_figure(fig, save_path)
         
         return fig
     
@@ -133,45 +286,52 @@ class MentalHealthVisualizer:
             rows=2, cols=2,
             subplot_titles=('Wait Time Distribution', 'Wait Times by Service Type',
                           'Wait Times Over Time', 'Wait Time vs No-Show Rate'),
-            specs=[[{'type': 'histogram'}, {'type': 'box'}],
+            specs=[[{'type': 'bar'}, {'type': 'box'}],
                    [{'type': 'scatter'}, {'type': 'scatter'}]]
         )
         
         # Wait time distribution
         fig.add_trace(
-            go.Histogram(x=self.df['wait_days'], nbinsx=30, name='Wait Days',
-                        marker_color=self.colors['primary']),
+            _histogram_bar(self.df['wait_days'], bins=30, name='Wait Days',
+                           marker_color=self.colors['primary']),
             row=1, col=1
         )
         
-        # Wait times by service type
-        for service in self.df['service_type'].unique():
-            service_data = self.df[self.df['service_type'] == service]['wait_days']
+        # Wait times by service type (one pass; groups in order of first appearance)
+        by_service = self.df.groupby('service_type', observed=True, sort=False)['wait_days']
+        for service, service_data in by_service:
             fig.add_trace(
-                go.Box(y=service_data, name=service),
+                go.Box(y=service_data.values, name=str(service)),
                 row=1, col=2
             )
         
         # Wait times over time
-        monthly_wait = self.df.copy()
-        monthly_wait['year_month'] = monthly_wait['appointment_date'].dt.to_period('M').astype(str)
-        wait_trend = monthly_wait.groupby('year_month')['wait_days'].mean().reset_index()
+        wait_trend = _with_year_month(self.df.groupby('ym_int')['wait_days'].mean().reset_index())
         
         fig.add_trace(
-            go.Scatter(x=wait_trend['year_month'], y=wait_trend['wait_days'],
-                      mode='lines+markers', name='Avg Wait Time',
-                      line=dict(color=self.colors['danger'])),
+            go.Scattergl(x=wait_trend['year_month'], y=wait_trend['wait_days'],
+                        mode='lines+markers', name='Avg Wait Time',
+                        line=dict(color=self.colors['danger'])),
             row=2, col=1
         )
         
-        # Wait time vs no-show rate
-        wait_bins = pd.cut(self.df['wait_days'], bins=[0, 3, 7, 14, 30])
-        no_show_rate = self.df.groupby(wait_bins)['no_show'].mean() * 100
+        # Wait time vs no-show rate: bin index per row, then counts and sums in one pass
+        # (NaN and out-of-range waits fall outside 0..n_bins-1 and are dropped)
+        n_bins = len(WAIT_BIN_EDGES) - 1
+        wait_days = self.df['wait_days'].to_numpy(dtype=float)
+        wait_bin = np.searchsorted(WAIT_BIN_EDGES, wait_days, side='left') - 1
+        in_range = (wait_bin >= 0) & (wait_bin < n_bins)
+        wait_bin = wait_bin[in_range]
+        no_shows = np.bincount(
+            wait_bin, weights=self.df['no_show'].to_numpy(dtype=float)[in_range], minlength=n_bins
+        )
+        visits = np.bincount(wait_bin, minlength=n_bins)
+        no_show_rate = 100 * np.divide(no_shows, visits, out=np.full(n_bins, np.nan), where=visits > 0)
         
         fig.add_trace(
-            go.Scatter(x=[str(x) for x in no_show_rate.index], y=no_show_rate.values,
-                      mode='lines+markers', name='No-Show Rate',
-                      line=dict(color=self.colors['warning'])),
+            go.Scattergl(x=WAIT_BIN_LABELS, y=no_show_rate,
+                        mode='lines+markers', name='No-Show Rate',
+                        line=dict(color=self.colors['warning'])),
             row=2, col=2
         )
         
@@ -183,17 +343,17 @@ class MentalHealthVisualizer:
         fig.update_yaxes(title_text="Avg Wait (days)", row=2, col=1)
         fig.update_xaxes(title_text="Wait Time Range", row=2, col=2)
         fig.update_yaxes(title_text="No-Show Rate (%)", row=2, col=2)
+        fig = _resample(fig)
         
         if save_path:
-            fig.write_html(save_path)
+            _write_figure(fig, save_path)
         
         return fig
     
     def plot_service_gaps_heatmap(self, save_path=None):
         """Create heatmap showing service gaps by college and service type"""
-        # Calculate average wait time by college and service type
-        gap_matrix = self.df.groupby(['student_college', 'service_type'])['wait_days'].mean().reset_index()
-        gap_pivot = gap_matrix.pivot(index='student_college', columns='service_type', values='wait_days')
+        # Average wait time by college and service type
+        gap_pivot = self._gap_pivot
         
         fig = go.Figure(data=go.Heatmap(
             z=gap_pivot.values,
@@ -215,19 +375,14 @@ class MentalHealthVisualizer:
         )
         
         if save_path:
-            fig.write_html(save_path)
+            _write_figure(fig, save_path)
         
         return fig
     
     def plot_counselor_workload(self, save_path=None):
         """Visualize counselor workload distribution"""
         # Aggregate counselor data
-        counselor_stats = self.df.groupby('counselor_id').agg({
-            'student_id': 'count',
-            'duration_minutes': 'sum'
-        }).reset_index()
-        counselor_stats.columns = ['counselor_id', 'appointments', 'total_minutes']
-        counselor_stats['total_hours'] = counselor_stats['total_minutes'] / 60
+        counselor_stats = self._counselor_stats
         
         fig = make_subplots(
             rows=1, cols=2,
@@ -236,15 +391,15 @@ class MentalHealthVisualizer:
         
         # Appointments distribution
         fig.add_trace(
-            go.Histogram(x=counselor_stats['appointments'], nbinsx=20,
-                        marker_color=self.colors['primary'], name='Appointments'),
+            _histogram_bar(counselor_stats['appointments'], bins=20,
+                           marker_color=self.colors['primary'], name='Appointments'),
             row=1, col=1
         )
         
         # Hours distribution
         fig.add_trace(
-            go.Histogram(x=counselor_stats['total_hours'], nbinsx=20,
-                        marker_color=self.colors['secondary'], name='Hours'),
+            _histogram_bar(counselor_stats['total_hours'], bins=20,
+                           marker_color=self.colors['secondary'], name='Hours'),
             row=1, col=2
         )
         
@@ -253,17 +408,17 @@ class MentalHealthVisualizer:
         fig.update_xaxes(title_text="Total Hours", row=1, col=2)
         
         if save_path:
-            fig.write_html(save_path)
+            _write_figure(fig, save_path)
         
         return fig
     
     def create_executive_dashboard(self, save_path='outputs/executive_dashboard.html'):
         """Create comprehensive executive dashboard"""
-        # Calculate KPIs
-        total_students = self.df['student_id'].nunique()
-        total_appointments = len(self.df)
-        avg_wait = self.df['wait_days'].mean()
-        no_show_rate = self.df['no_show'].mean() * 100
+        # KPIs
+        kpis = self._kpis
+        total_students = kpis['total_students']
+        avg_wait = kpis['avg_wait']
+        no_show_rate = kpis['no_show_rate']
         
         # Create dashboard
         fig = make_subplots(
@@ -296,23 +451,21 @@ class MentalHealthVisualizer:
         )
         
         # Trend
-        monthly = self.df.copy()
-        monthly['month'] = monthly['appointment_date'].dt.to_period('M').astype(str)
-        trend = monthly.groupby('month').size().reset_index(name='count')
+        trend = self._monthly_counts
         
         fig.add_trace(
-            go.Scatter(x=trend['month'], y=trend['count'], mode='lines+markers',
-                      line=dict(color=self.colors['primary'])),
+            go.Scattergl(x=trend['year_month'], y=trend['count'], mode='lines+markers',
+                        line=dict(color=self.colors['primary'])),
             row=1, col=2
         )
         
         # Wait times by service
-        for service in self.df['service_type'].unique()[:5]:  # Top 5
-            data = self.df[self.df['service_type'] == service]['wait_days']
-            fig.add_trace(go.Box(y=data, name=service), row=2, col=1)
+        by_service = self.df.groupby('service_type', observed=True, sort=False)['wait_days']
+        for service, data in islice(by_service, 5):  # Top 5
+            fig.add_trace(go.Box(y=data.values, name=str(service)), row=2, col=1)
         
         # Demographics
-        year_counts = self.df['student_year'].value_counts()
+        year_counts = self._year_counts
         fig.add_trace(
             go.Bar(x=year_counts.index, y=year_counts.values,
                   marker_color=self.colors['secondary']),
@@ -320,8 +473,7 @@ class MentalHealthVisualizer:
         )
         
         # Heatmap
-        gap_matrix = self.df.groupby(['student_college', 'service_type'])['wait_days'].mean().reset_index()
-        gap_pivot = gap_matrix.pivot(index='student_college', columns='service_type', values='wait_days')
+        gap_pivot = self._gap_pivot
         
         fig.add_trace(
             go.Heatmap(
@@ -338,44 +490,64 @@ class MentalHealthVisualizer:
             title_text="Mental Health Services - Executive Dashboard",
             showlegend=False
         )
+        fig = _resample(fig)
         
         if save_path:
-            fig.write_html(save_path)
+            _write_figure(fig, save_path)
             print(f"Dashboard saved to {save_path}")
         
         return fig
     
-    def generate_all_visualizations(self, output_dir='outputs/visualizations'):
-        """Generate all visualizations"""
-        import os
-        os.makedirs(output_dir, exist_ok=True)
-        
-        print("Generating visualizations...")
-        
-        self.plot_service_utilization_trends(f"{output_dir}/utilization_trends.html")
-        print("✓ Utilization trends")
-        
-        self.plot_demographic_distribution(f"{output_dir}/demographics.html")
-        print("✓ Demographics")
+    def generate_all_visualizations(self, output_dir='outputs/visualizations', max_workers=None,
+                                    static=False):
+        """
+        Generate all visualizations
         
-        self.plot_wait_time_analysis(f"{output_dir}/wait_times.html")
-        print("✓ Wait time analysis")
+        Plots are independent and each writes its own file, so they are
+        built concurrently.
         
-        self.plot_service_gaps_heatmap(f"{output_dir}/service_gaps.html")
-        print("✓ Service gaps heatmap")
+        Args:
+            output_dir: Directory for the output files
+            max_workers: Maximum number of plots built at once (default: one per plot, up to CPU count)
+            static: Write PNG images (requires kaleido) instead of interactive HTML
+        """
+        os.makedirs(output_dir, exist_ok=True)
         
-        self.plot_counselor_workload(f"{output_dir}/counselor_workload.html")
-        print("✓ Counselor workload")
+        print("Generating visualizations...")
         
-        self.create_executive_dashboard(f"{output_dir}/executive_dashboard.html")
-        print("✓ Executive dashboard")
+        plots = [
+            (self.plot_service_utilization_trends, "utilization_trends.html", "Utilization trends"),
+            (self.plot_demographic_distribution, "demographics.html", "Demographics"),
+            (self.plot_wait_time_analysis, "wait_times.html", "Wait time analysis"),
+            (self.plot_service_gaps_heatmap, "service_gaps.html", "Service gaps heatmap"),
+            (self.plot_counselor_workload, "counselor_workload.html", "Counselor workload"),
+            (self.create_executive_dashboard, "executive_dashboard.html", "Executive dashboard"),
+        ]
+        
+        # Fill the shared aggregates up front so worker threads only read them
+        for name in self._cached_aggregates():
+            getattr(self, name)
+        
+        def build(plot, filename, label):
+            if static:
+                filename = filename.replace('.html', '.png')
+            plot(f"{output_dir}/{filename}")
+            print(f"✓ {label}")
+        
+        if max_workers is None:
+            max_workers = min(len(plots), os.cpu_count() or 1)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(build, *plot) for plot in plots]
+            for future in futures:
+                future.result()
         
         print(f"\nAll visualizations saved to {output_dir}/")
 
 
 def main():
     """Generate visualizations"""
-    viz = MentalHealthVisualizer('/home/claude/unt-mental-health-analysis/data/raw/mental_health_data.csv')
+    viz = MentalHealthVisualizer('/home/claude/unt-mental-health-analysis/data/raw/mental_health_data.parquet')
     viz.generate_all_visualizations('/home/claude/unt-mental-health-analysis/outputs/visualizations')
 
 
@@ -0,0 +1,80 @@
+"""
+Dry-run checks for the BigQuery queries in the service gap analysis
+
+Each module-level *_QUERY constant is validated by BigQuery with a dry run
+(no bytes billed), so syntax errors such as invalid function names fail here
+instead of at analysis time.
+
+Runs against a real project when GCP_PROJECT_ID and application default
+credentials are available, or against an emulator when BIGQUERY_EMULATOR_HOST
+is set; skipped otherwise. BQ_SERVICE_RECORDS_TABLE overrides the table the
+queries are validated against.
+"""
+
+import os
+import sys
+
+import pytest
+
+bigquery = pytest.importorskip("google.cloud.bigquery")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'analysis'))
+import service_gap_analysis  # noqa: E402
+
+QUERY_NAMES = sorted(
+    name for name in vars(service_gap_analysis)
+    if name.endswith('_QUERY') and isinstance(getattr(service_gap_analysis, name), str)
+)
+
+
+def _make_client():
+    """BigQuery client for the emulator or the configured project, or None"""
+    project_id = os.environ.get('GCP_PROJECT_ID')
+    emulator_host = os.environ.get('BIGQUERY_EMULATOR_HOST')
+
+    if emulator_host:
+        from google.api_core.client_options import ClientOptions
+        from google.auth.credentials import AnonymousCredentials
+        return bigquery.Client(
+            project=project_id or 'test',
+            credentials=AnonymousCredentials(),
+            client_options=ClientOptions(api_endpoint=f"http://{emulator_host}")
+        )
+
+    if not project_id:
+        return None
+
+    import google.auth
+    from google.auth.exceptions import DefaultCredentialsError
+    try:
+        google.auth.default()
+    except DefaultCredentialsError:
+        return None
+    return bigquery.Client(project=project_id)
+
+
+@pytest.fixture(scope='module')
+def client():
+    client = _make_client()
+    if client is None:
+        pytest.skip("No BigQuery credentials or emulator (set GCP_PROJECT_ID or BIGQUERY_EMULATOR_HOST)")
+    return client
+
+
+def test_queries_discovered():
+    """Every analysis query is picked up by the dry-run check"""
+    assert len(QUERY_NAMES) >= 6
+
+
+@pytest.mark.parametrize('query_name', QUERY_NAMES)
+def test_query_dry_run(client, query_name):
+    """BigQuery accepts the query (syntax, functions and referenced columns)"""
+    table = os.environ.get('BQ_SERVICE_RECORDS_TABLE', service_gap_analysis.SERVICE_RECORDS_TABLE)
+    query = getattr(service_gap_analysis, query_name).format(table=table)
+
+    job = client.query(
+        query,
+        job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    )
+
+    assert job.state == 'DONE'